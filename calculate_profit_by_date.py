@@ -1,49 +1,197 @@
-import json
 import os
 from datetime import datetime, timezone, timedelta
 from calculate_profit_history import (
     get_hold,
-    get_price,
-    load_trade_history,
-    get_all_tickers,
-    extract_ticker_trades,
+    get_price_resolver,
+    load_trade_book,
     calculate_profit_components,
-    calculate_ticker_roi,
-    calculate_ticker_vs_btc,
-    calculate_btc_baseline
+    prefetch_candle_range,
+    MAX_CANDLES_PER_REQUEST,
 )
+from trade_book import TradeBook, TradeSnapshot, new_ticker_data, add_fill
+from price_resolver import SOURCE_CANDLE, SOURCE_FIRST_TRADE, SOURCE_NONE
+from utils import write_json_records_atomic
+from snapshot_store import save_snapshot, STORE_PATH
+
+# Set DUMP_FILTERED_TRADES=1 to write the trades behind each date's comparison to DEBUG_DUMP_DIR
+DUMP_FILTERED_TRADES = os.getenv("DUMP_FILTERED_TRADES", "0") == "1"
+DEBUG_DUMP_DIR = "./trade_history/debug"
+
+def get_end_of_day(end_date_str):
+    """Get the cutoff time (23:59:59 UTC) for a date in format "YYYY-MM-DD" or "YYYYMMDD" """
+    if len(end_date_str) == 8:  # YYYYMMDD format
+        end_date = datetime.strptime(end_date_str, "%Y%m%d")
+    else:  # YYYY-MM-DD format
+        end_date = datetime.strptime(end_date_str, "%Y-%m-%d")
+    
+    return end_date.replace(hour=23, minute=59, second=59, tzinfo=timezone.utc)
 
 def filter_trades_by_date(trade_history, end_date_str):
     """Filter trades up to a specific date
     
     Args:
-        trade_history: List of all trades
+        trade_history: TradeBook, or a list of trades (indexed on the fly)
         end_date_str: End date in format "YYYY-MM-DD" or "YYYYMMDD"
     
     Returns:
-        List of trades up to (and including) the end date
+        Trades up to (and including) the end date, sorted by trade_time
+        (a view selected by binary search when given a TradeBook)
     """
-    # Parse end date
-    if len(end_date_str) == 8:  # YYYYMMDD format
-        end_date = datetime.strptime(end_date_str, "%Y%m%d")
-    else:  # YYYY-MM-DD format
-        end_date = datetime.strptime(end_date_str, "%Y-%m-%d")
+    if not isinstance(trade_history, TradeBook):
+        trade_history = TradeBook(trade_history)
+    return trade_history.up_to(get_end_of_day(end_date_str)).trades
+
+def dump_filtered_trades(end_date_str, trades):
+    """Write the trades up to a date to a per-process debug file
     
-    end_date = end_date.replace(hour=23, minute=59, second=59, tzinfo=timezone.utc)
+    Only used when DUMP_FILTERED_TRADES is on; the comparison itself runs
+    entirely in memory.
     
-    filtered_trades = []
-    for trade in trade_history:
-        trade_time = datetime.fromisoformat(trade["trade_time"].replace('Z', '+00:00'))
-        if trade_time <= end_date:
-            filtered_trades.append(trade)
+    Returns:
+        str: Path of the written file
+    """
+    date_key = end_date_str.replace("-", "")
+    file_path = f"{DEBUG_DUMP_DIR}/filtered_{date_key}_{os.getpid()}.jsonl"
+    write_json_records_atomic(file_path, trades)
+    print(f"  🐛 Filtered trades written to {file_path}")
+    return file_path
+
+def get_hold_at_date(end_date_str, trade_book=None, live_hold=None):
+    """Get holdings at the end of a date
     
-    return filtered_trades
+    Past dates are reconstructed from the fill history (see
+    trade_book.PositionLedger), so they are reproducible and need no API
+    call. Today uses live balances, which are checked against the ledger.
+    
+    Args:
+        end_date_str: End date in format "YYYY-MM-DD" or "YYYYMMDD"
+        trade_book: TradeBook of all trades (optional, will load if not provided)
+        live_hold: Live holdings as returned by get_hold() (optional, will fetch if needed)
+    
+    Returns:
+        dict: Holdings in the same format as get_hold()
+    """
+    if trade_book is None:
+        trade_book = load_trade_book("alltime")
+    ledger = trade_book.position_ledger()
+    
+    end_of_day = get_end_of_day(end_date_str)
+    if end_of_day <= datetime.now(timezone.utc):
+        return ledger.holdings_at(end_of_day)
+    
+    if live_hold is None:
+        live_hold = get_hold()
+    mismatches = ledger.reconcile(live_hold)
+    if mismatches:
+        print(f"  ⚠️  Live balances differ from the fill history for {len(mismatches)} coin(s):")
+        for coin, mismatch in sorted(mismatches.items()):
+            print(f"     {coin}: live {mismatch['live']}, from fills {mismatch['ledger']} (difference {mismatch['difference']:+})")
+    return live_hold
+
+def sweep_trade_snapshots(trade_book, date_strs):
+    """Walk the sorted fills once and yield the cumulative trade data for each date
+    
+    Running per-ticker totals are updated as each day's fills come in, so a
+    backfill over many dates costs O(trades + dates x tickers) instead of
+    refiltering and re-summing the whole history for every date.
+    
+    Args:
+        trade_book: TradeBook of all trades
+        date_strs: Dates in format "YYYY-MM-DD" or "YYYYMMDD"
+    
+    Yields:
+        tuple: (date_str, TradeSnapshot of all trades up to the end of that date)
+    """
+    fills = trade_book.fills
+    position = 0
+    running = {}
+    
+    for date_str in sorted(date_strs, key=get_end_of_day):
+        cutoff = len(trade_book.up_to(get_end_of_day(date_str)))
+        while position < cutoff:
+            fill = fills[position]
+            if fill.product_id not in running:
+                running[fill.product_id] = new_ticker_data()
+            add_fill(running[fill.product_id], fill)
+            position += 1
+        
+        ticker_data = {ticker: dict(data) for ticker, data in running.items()}
+        yield date_str, TradeSnapshot(trade_book, position, ticker_data)
 
-def calculate_profit_by_date(end_date_str):
+def _prefetch_minute_candles(ticker, timestamps):
+    """Prefetch the one-minute candles behind point lookups at the given times
+    
+    Nearby timestamps are grouped so that one request covers as many of them
+    as the candles endpoint allows.
+    
+    Returns:
+        int: Number of API requests made
+    """
+    window = (MAX_CANDLES_PER_REQUEST - 1) * 60
+    seconds = sorted(int(datetime.fromisoformat(ts.replace('Z', '+00:00')).timestamp()) for ts in timestamps)
+    
+    requests_made = 0
+    idx = 0
+    while idx < len(seconds):
+        group_start = seconds[idx]
+        while idx < len(seconds) and seconds[idx] + 60 - group_start <= window:
+            idx += 1
+        requests_made += prefetch_candle_range(ticker, group_start, seconds[idx - 1] + 60, "ONE_MINUTE")
+    return requests_made
+
+def prefetch_prices_for_dates(date_strs, trade_book=None):
+    """Bulk-load every price a backfill over the given dates will look up
+    
+    End-of-day prices come from daily candles (the next day's open), and
+    first-buy prices from one-minute candles around each first buy, so the
+    per-date calculations are answered from the price cache.
+    
+    Args:
+        date_strs: Dates in format "YYYY-MM-DD"
+        trade_book: TradeBook of all trades (optional, will load if not provided)
+    
+    Returns:
+        int: Number of API requests made
+    """
+    if not date_strs:
+        return 0
+    if trade_book is None:
+        trade_book = load_trade_book("alltime")
+    
+    last_date = max(date_strs)
+    filtered_book = trade_book.up_to(get_end_of_day(last_date))
+    
+    tickers = {f"{coin}-USDC" for coin in filtered_book.get_all_coins() if coin != "USDC"}
+    first_buy_times = {}
+    for ticker in tickers:
+        first_buy_time = filtered_book.extract(ticker)["first_buy_time"]
+        if first_buy_time:
+            first_buy_times[ticker] = first_buy_time
+    tickers.add("BTC-USDC")
+    
+    # The end-of-day lookup for date D resolves to the first minute of D+1
+    first_day = datetime.strptime(min(date_strs), "%Y-%m-%d").replace(tzinfo=timezone.utc) + timedelta(days=1)
+    last_day = datetime.strptime(last_date, "%Y-%m-%d").replace(tzinfo=timezone.utc) + timedelta(days=1)
+    
+    print(f"Prefetching prices for {len(tickers)} tickers from {min(date_strs)} to {last_date}...")
+    requests_made = 0
+    for ticker in sorted(tickers):
+        requests_made += prefetch_candle_range(ticker, first_day.timestamp(), last_day.timestamp(), "ONE_DAY")
+        if ticker in first_buy_times:
+            requests_made += _prefetch_minute_candles(ticker, [first_buy_times[ticker]])
+    requests_made += _prefetch_minute_candles("BTC-USDC", first_buy_times.values())
+    print(f"  ✅ Prefetch complete ({requests_made} API requests)")
+    
+    return requests_made
+
+def calculate_profit_by_date(end_date_str, trade_book=None, snapshot=None, hold=None):
     """Calculate profit from beginning to a specific date
     
     Args:
         end_date_str: End date in format "YYYY-MM-DD" or "YYYYMMDD"
+        trade_book: TradeBook of all trades (optional, will load if not provided)
+        snapshot: TradeSnapshot for end_date_str from sweep_trade_snapshots (optional)
+        hold: Holdings at the end date (optional, see get_hold_at_date)
     
     Returns:
         List of profit data for each coin
@@ -71,27 +219,28 @@ def calculate_profit_by_date(end_date_str):
     end_date_iso = end_datetime.isoformat().replace('+00:00', 'Z')
     
     # Load all trade history
-    all_trades = load_trade_history("alltime")
+    if trade_book is None:
+        trade_book = load_trade_book("alltime")
+    price_resolver = get_price_resolver(trade_book)
     
-    # Filter trades by date
-    filtered_trades = filter_trades_by_date(all_trades, end_date_str)
+    if snapshot is not None:
+        filtered_book = snapshot
+    else:
+        # Select trades up to the end of the date
+        filtered_book = trade_book.up_to(get_end_of_day(end_date_str))
     
-    if not filtered_trades:
+    if not filtered_book:
         print(f"No trades found up to {end_date_str}")
         return []
     
-    print(f"Found {len(filtered_trades)} trades up to {end_date_str}")
+    print(f"Found {len(filtered_book)} trades up to {end_date_str}")
     
     # Get all tickers from filtered trades
-    tickers = set(trade["product_id"] for trade in filtered_trades)
-    all_coins = []
-    for ticker in tickers:
-        if ticker.endswith("-USDC") or ticker.endswith("-USD"):
-            coin = ticker.split("-")[0]
-            all_coins.append(coin)
+    all_coins = filtered_book.get_all_coins()
     
-    # Get current holdings (to know what we're still holding)
-    hold = get_hold()
+    # Get holdings at the end date (to know what we were still holding)
+    if hold is None:
+        hold = get_hold_at_date(end_date_str, trade_book=trade_book)
     
     results = []
     print(f"\n{'Coin':<10} {'Realized':<15} {'Unrealized':<15} {'Total':<15}")
@@ -101,41 +250,25 @@ def calculate_profit_by_date(end_date_str):
         ticker = f"{coin}-USDC"
         
         # Extract trades for this ticker from filtered trades
-        trades_data = extract_ticker_trades(filtered_trades, ticker)
+        trades_data = filtered_book.extract(ticker)
         
         # Get current hold amount
         hold_amount = hold.get(coin, {}).get("hold", 0)
         
         # Get price at the end date (historical price)
         if hold_amount > 0:
-            from calculate_profit_history import get_historical_price_from_candles, get_price
-            historical_price = get_historical_price_from_candles(ticker, end_date_iso)
-            if not historical_price:
-                # Fallback 1: try to get current real-time price
-                print(f"  ⚠️  Could not get historical price for {coin} at {end_date_str}, trying real-time price...")
-                current_price = get_price(ticker)
-                if current_price and current_price > 0:
-                    historical_price = current_price
-                    print(f"  ℹ️  Using current price ${historical_price:.2f} for {coin}")
-                else:
-                    # Fallback 2: use the last trade price before end date
-                    ticker_trades = sorted([t for t in filtered_trades if t["product_id"] == ticker], 
-                                         key=lambda x: x["trade_time"], reverse=True)
-                    if ticker_trades:
-                        historical_price = float(ticker_trades[0]["price"])
-                        print(f"  ℹ️  Using last trade price ${historical_price:.2f} for {coin}")
-                    else:
-                        historical_price = 0
-                        print(f"  ⚠️  Could not determine any price for {coin} at {end_date_str}")
+            historical_price = price_resolver.price_at(ticker, end_date_iso) or 0
+            source = price_resolver.get_source(ticker, end_date_iso)
+            if source == SOURCE_NONE:
+                print(f"  ⚠️  Could not determine any price for {coin} at {end_date_str}")
+            elif source != SOURCE_CANDLE:
+                print(f"  ℹ️  No candle for {coin} at {end_date_str}, using {source.replace('_', ' ')} price ${historical_price:.2f}")
         else:
             historical_price = 0
         
         # Calculate profit components using historical price
         profit_components = calculate_profit_components(trades_data, hold_amount, historical_price)
         
-        # Calculate profit components using historical price
-        profit_components = calculate_profit_components(trades_data, hold_amount, historical_price)
-        
         result = {
             "ticker": ticker,
             "total_buys": round(float(trades_data["total_buys"]), 8),
@@ -158,12 +291,15 @@ def calculate_profit_by_date(end_date_str):
     
     return results
 
-def calculate_comparison_by_date(end_date_str, profit_results=None):
+def calculate_comparison_by_date(end_date_str, profit_results=None, trade_book=None, snapshot=None, hold=None):
     """Calculate ROI and vs BTC comparison from beginning to a specific date
     
     Args:
         end_date_str: End date in format "YYYY-MM-DD" or "YYYYMMDD"
         profit_results: Pre-calculated profit results (optional)
+        trade_book: TradeBook of all trades (optional, will load if not provided)
+        snapshot: TradeSnapshot for end_date_str from sweep_trade_snapshots (optional)
+        hold: Holdings at the end date (optional, see get_hold_at_date)
     
     Returns:
         Dictionary containing roi_comparison and vs_btc_comparison
@@ -186,287 +322,233 @@ def calculate_comparison_by_date(end_date_str, profit_results=None):
     end_date_iso = end_datetime.isoformat().replace('+00:00', 'Z')
     
     # Load all trade history
-    all_trades = load_trade_history("alltime")
+    if trade_book is None:
+        trade_book = load_trade_book("alltime")
+    price_resolver = get_price_resolver(trade_book)
     
-    # Filter trades by date
-    filtered_trades = filter_trades_by_date(all_trades, end_date_str)
+    if snapshot is not None:
+        filtered_book = snapshot
+    else:
+        # Select trades up to the end of the date
+        filtered_book = trade_book.up_to(get_end_of_day(end_date_str))
     
-    if not filtered_trades:
+    if not filtered_book:
         print(f"No trades found up to {end_date_str}")
         return None
     
-    # Create temporary trade history file for filtered trades
-    temp_file = "./trade_history/temp_filtered.json"
-    with open(temp_file, "w") as f:
-        json.dump(filtered_trades, f, indent=4)
-    
-    try:
-        # Get all tickers from filtered trades
-        tickers = set(trade["product_id"] for trade in filtered_trades)
-        all_coins = []
-        for ticker in tickers:
-            if ticker.endswith("-USDC") or ticker.endswith("-USD"):
-                coin = ticker.split("-")[0]
-                all_coins.append(coin)
+    if DUMP_FILTERED_TRADES:
+        dump_filtered_trades(end_date_str, filtered_book.trades)
+    
+    # Get all tickers from filtered trades
+    all_coins = filtered_book.get_all_coins()
+    
+    # Get holdings at the end date
+    if hold is None:
+        hold = get_hold_at_date(end_date_str, trade_book=trade_book)
+    
+    # Create profit dict from results
+    if profit_results:
+        profit_dict = {item["ticker"]: item for item in profit_results}
+    else:
+        profit_dict = {}
+    
+    # Calculate ROI comparison
+    print(f"\n{'='*130}")
+    print("ROI COMPARISON")
+    print(f"{'='*130}\n")
+    
+    roi_results = []
+    for coin in all_coins:
+        if coin == "USDC":
+            continue
+        ticker = f"{coin}-USDC"
+        profit_data = profit_dict.get(ticker)
+        
+        # Extract trades for this ticker from filtered trades
+        trades_data = filtered_book.extract(ticker)
+        hold_amount = hold.get(coin, {}).get("hold", 0)
+        
+        # Get price at the end date (historical price)
+        if hold_amount > 0:
+            current_price = price_resolver.price_at(ticker, end_date_iso) or 0
+        else:
+            current_price = 0
         
-        # Get current holdings
-        hold = get_hold()
+        # Use provided profit data or calculate it
+        if profit_data:
+            total_profit = profit_data["total_profit"]
+            total_buys = profit_data["total_buys"]
+            realized_profit = profit_data["realized_profit"]
+            unrealized_profit = profit_data["unrealized_profit"]
+        else:
+            profit_components = calculate_profit_components(trades_data, hold_amount, current_price)
+            total_profit = profit_components["total_profit"]
+            realized_profit = profit_components["realized_profit"]
+            unrealized_profit = profit_components["unrealized_profit"]
+            total_buys = trades_data["total_buys"]
         
-        # Create profit dict from results
-        if profit_results:
-            profit_dict = {item["ticker"]: item for item in profit_results}
+        # Calculate ROI metrics (similar to calculate_ticker_roi)
+        avg_buy_price = trades_data["total_buys"] / trades_data["total_buy_size"] if trades_data["total_buy_size"] > 0 else 0
+        if hold_amount > 0 and trades_data["total_buy_size"] > 0:
+            net_investment = avg_buy_price * hold_amount
         else:
-            profit_dict = {}
+            net_investment = 0
         
-        # Calculate ROI comparison
-        print(f"\n{'='*130}")
-        print("ROI COMPARISON")
-        print(f"{'='*130}\n")
+        hold_ratio = (hold_amount / trades_data["total_buy_size"]) if trades_data["total_buy_size"] > 0 else 0
         
-        roi_results = []
-        for coin in all_coins:
-            if coin == "USDC":
-                continue
-            ticker = f"{coin}-USDC"
-            profit_data = profit_dict.get(ticker)
-            
-            # Extract trades for this ticker from filtered trades
-            trades_data = extract_ticker_trades(filtered_trades, ticker)
-            hold_amount = hold.get(coin, {}).get("hold", 0)
-            
+        if hold_ratio < 0.05:
+            trading_roi_percent = (total_profit / total_buys * 100) if total_buys > 0 else 0
+            net_investment = total_buys
+        elif hold_amount > 0 and net_investment > 0:
+            trading_roi_percent = (total_profit / net_investment * 100)
+        else:
+            trading_roi_percent = 0
+        
+        # Get start price
+        start_time = trades_data["first_buy_time"]
+        if start_time:
+            start_price = price_resolver.price_at(ticker, start_time, fallback=SOURCE_FIRST_TRADE) or current_price
+        else:
+            start_price = current_price
+        
+        # Calculate price change
+        if hold_amount > 0:
+            price_change_percent = ((current_price - start_price) / start_price * 100) if start_price > 0 else 0
+        else:
+            avg_sell_price = trades_data["total_sells"] / trades_data["total_sell_size"] if trades_data["total_sell_size"] > 0 else 0
+            price_change_percent = ((avg_sell_price - start_price) / start_price * 100) if start_price > 0 else 0
+            current_price = avg_sell_price
+        
+        performance_diff = trading_roi_percent - price_change_percent
+        
+        result = {
+            "ticker": ticker,
+            "start_time": start_time,
+            "start_price": round(float(start_price), 8),
+            "current_price": round(float(current_price), 8),
+            "price_change_percent": round(float(price_change_percent), 2),
+            "total_buys": round(float(total_buys), 8),
+            "total_sells": round(float(trades_data["total_sells"]), 8),
+            "net_investment": round(float(net_investment), 8),
+            "hold_amount": round(float(hold_amount), 8),
+            "realized_profit": round(float(realized_profit), 8),
+            "unrealized_profit": round(float(unrealized_profit), 8),
+            "total_profit": round(float(total_profit), 8),
+            "trading_roi_percent": round(float(trading_roi_percent), 2),
+            "performance_diff": round(float(performance_diff), 2),
+            "beat_hodl": performance_diff >= 0
+        }
+        roi_results.append(result)
+    
+    # Calculate vs BTC comparison
+    print(f"\n{'='*90}")
+    print("VS BTC COMPARISON")
+    print(f"{'='*90}\n")
+    
+    btc_results = []
+    for coin in all_coins:
+        if coin == "USDC":
+            continue
+        ticker = f"{coin}-USDC"
+        profit_data = profit_dict.get(ticker)
+        
+        # Extract trades for this ticker
+        trades_data = filtered_book.extract(ticker)
+        hold_amount = hold.get(coin, {}).get("hold", 0)
+        
+        # Get actual profit
+        if profit_data:
+            actual_profit = profit_data["total_profit"]
+            total_buys = profit_data["total_buys"]
+            total_sells = profit_data["total_sells"]
+        else:
             # Get price at the end date (historical price)
             if hold_amount > 0:
-                from calculate_profit_history import get_historical_price_from_candles, get_price
-                current_price = get_historical_price_from_candles(ticker, end_date_iso)
-                if not current_price:
-                    # Fallback 1: try to get current real-time price
-                    real_time_price = get_price(ticker)
-                    if real_time_price and real_time_price > 0:
-                        current_price = real_time_price
-                    else:
-                        # Fallback 2: use the last trade price before end date
-                        ticker_trades = sorted([t for t in filtered_trades if t["product_id"] == ticker], 
-                                             key=lambda x: x["trade_time"], reverse=True)
-                        if ticker_trades:
-                            current_price = float(ticker_trades[0]["price"])
-                        else:
-                            current_price = 0
+                current_price = price_resolver.price_at(ticker, end_date_iso) or 0
             else:
                 current_price = 0
-            
-            # Use provided profit data or calculate it
-            if profit_data:
-                total_profit = profit_data["total_profit"]
-                total_buys = profit_data["total_buys"]
-                realized_profit = profit_data["realized_profit"]
-                unrealized_profit = profit_data["unrealized_profit"]
-            else:
-                profit_components = calculate_profit_components(trades_data, hold_amount, current_price)
-                total_profit = profit_components["total_profit"]
-                realized_profit = profit_components["realized_profit"]
-                unrealized_profit = profit_components["unrealized_profit"]
-                total_buys = trades_data["total_buys"]
-            
-            # Calculate ROI metrics (similar to calculate_ticker_roi)
-            avg_buy_price = trades_data["total_buys"] / trades_data["total_buy_size"] if trades_data["total_buy_size"] > 0 else 0
-            if hold_amount > 0 and trades_data["total_buy_size"] > 0:
-                net_investment = avg_buy_price * hold_amount
-            else:
-                net_investment = 0
-            
-            hold_ratio = (hold_amount / trades_data["total_buy_size"]) if trades_data["total_buy_size"] > 0 else 0
-            
-            if hold_ratio < 0.05:
-                trading_roi_percent = (total_profit / total_buys * 100) if total_buys > 0 else 0
-                net_investment = total_buys
-            elif hold_amount > 0 and net_investment > 0:
-                trading_roi_percent = (total_profit / net_investment * 100)
-            else:
-                trading_roi_percent = 0
-            
-            # Get start price
-            start_time = min(trades_data["buy_times"]) if trades_data["buy_times"] else None
-            if start_time:
-                from calculate_profit_history import get_historical_price_from_candles, get_price
-                start_price = get_historical_price_from_candles(ticker, start_time)
-                if not start_price:
-                    # Fallback to first trade price
-                    ticker_trades = sorted([t for t in filtered_trades if t["product_id"] == ticker], key=lambda x: x["trade_time"])
-                    if ticker_trades:
-                        start_price = float(ticker_trades[0]["price"])
-                    else:
-                        start_price = current_price
-            else:
-                start_price = current_price
-            
-            # Calculate price change
-            if hold_amount > 0:
-                price_change_percent = ((current_price - start_price) / start_price * 100) if start_price > 0 else 0
-            else:
-                avg_sell_price = trades_data["total_sells"] / trades_data["total_sell_size"] if trades_data["total_sell_size"] > 0 else 0
-                price_change_percent = ((avg_sell_price - start_price) / start_price * 100) if start_price > 0 else 0
-                current_price = avg_sell_price
-            
-            performance_diff = trading_roi_percent - price_change_percent
-            
-            result = {
-                "ticker": ticker,
-                "start_time": start_time,
-                "start_price": round(float(start_price), 8),
-                "current_price": round(float(current_price), 8),
-                "price_change_percent": round(float(price_change_percent), 2),
-                "total_buys": round(float(total_buys), 8),
-                "total_sells": round(float(trades_data["total_sells"]), 8),
-                "net_investment": round(float(net_investment), 8),
-                "hold_amount": round(float(hold_amount), 8),
-                "realized_profit": round(float(realized_profit), 8),
-                "unrealized_profit": round(float(unrealized_profit), 8),
-                "total_profit": round(float(total_profit), 8),
-                "trading_roi_percent": round(float(trading_roi_percent), 2),
-                "performance_diff": round(float(performance_diff), 2),
-                "beat_hodl": performance_diff >= 0
-            }
-            roi_results.append(result)
-        
-        # Calculate vs BTC comparison
-        print(f"\n{'='*90}")
-        print("VS BTC COMPARISON")
-        print(f"{'='*90}\n")
+                
+            profit_components = calculate_profit_components(trades_data, hold_amount, current_price)
+            actual_profit = profit_components["total_profit"]
+            total_buys = trades_data["total_buys"]
+            total_sells = trades_data["total_sells"]
         
-        btc_results = []
-        for coin in all_coins:
-            if coin == "USDC":
-                continue
-            ticker = f"{coin}-USDC"
-            profit_data = profit_dict.get(ticker)
+        # Calculate BTC alternative profit
+        if trades_data["first_buy_time"] and total_buys > 0:
+            start_time = trades_data["first_buy_time"]
             
-            # Extract trades for this ticker
-            trades_data = extract_ticker_trades(filtered_trades, ticker)
-            hold_amount = hold.get(coin, {}).get("hold", 0)
+            btc_price_start = price_resolver.price_at("BTC-USDC", start_time, fallback=SOURCE_FIRST_TRADE)
             
-            # Get actual profit
-            if profit_data:
-                actual_profit = profit_data["total_profit"]
-                total_buys = profit_data["total_buys"]
-                total_sells = profit_data["total_sells"]
-            else:
-                # Get price at the end date (historical price)
-                if hold_amount > 0:
-                    from calculate_profit_history import get_price
-                    current_price = get_historical_price_from_candles(ticker, end_date_iso)
-                    if not current_price:
-                        # Fallback 1: try current real-time price
-                        real_time_price = get_price(ticker)
-                        if real_time_price and real_time_price > 0:
-                            current_price = real_time_price
-                        else:
-                            # Fallback 2: use last trade price
-                            ticker_trades = sorted([t for t in filtered_trades if t["product_id"] == ticker], 
-                                                 key=lambda x: x["trade_time"], reverse=True)
-                            if ticker_trades:
-                                current_price = float(ticker_trades[0]["price"])
-                            else:
-                                current_price = 0
-                else:
-                    current_price = 0
-                    
-                profit_components = calculate_profit_components(trades_data, hold_amount, current_price)
-                actual_profit = profit_components["total_profit"]
-                total_buys = trades_data["total_buys"]
-                total_sells = trades_data["total_sells"]
+            # Get BTC price at the end date (historical price)
+            btc_price_current = price_resolver.price_at("BTC-USDC", end_date_iso)
             
-            # Calculate BTC alternative profit
-            if trades_data["buy_times"] and total_buys > 0:
-                start_time = min(trades_data["buy_times"])
-                
-                from calculate_profit_history import get_historical_price_from_candles
-                btc_price_start = get_historical_price_from_candles("BTC-USDC", start_time)
-                if not btc_price_start:
-                    btc_trades = sorted([t for t in filtered_trades if t["product_id"] == "BTC-USDC"], key=lambda x: x["trade_time"])
-                    if btc_trades:
-                        btc_price_start = float(btc_trades[0]["price"])
-                    else:
-                        btc_price_start = get_price("BTC-USDC")
-                
-                # Get BTC price at the end date (historical price)
-                btc_price_current = get_historical_price_from_candles("BTC-USDC", end_date_iso)
-                if not btc_price_current:
-                    btc_trades = sorted([t for t in filtered_trades if t["product_id"] == "BTC-USDC"], 
-                                       key=lambda x: x["trade_time"], reverse=True)
-                    if btc_trades:
-                        btc_price_current = float(btc_trades[0]["price"])
-                    else:
-                        btc_price_current = get_price("BTC-USDC")
-                
-                net_investment = total_buys - total_sells
-                btc_amount = total_buys / btc_price_start
-                btc_value_from_buys = btc_amount * btc_price_current
-                btc_value_after_sells = btc_value_from_buys - total_sells
-                btc_alternative_profit = btc_value_after_sells - net_investment
-                
-                difference = actual_profit - btc_alternative_profit
-            else:
-                start_time = None
-                btc_alternative_profit = 0
-                difference = 0
+            net_investment = total_buys - total_sells
+            btc_amount = total_buys / btc_price_start
+            btc_value_from_buys = btc_amount * btc_price_current
+            btc_value_after_sells = btc_value_from_buys - total_sells
+            btc_alternative_profit = btc_value_after_sells - net_investment
             
-            result = {
-                "ticker": ticker,
-                "start_time": start_time,
-                "total_buys": round(float(total_buys), 8),
-                "total_sells": round(float(total_sells), 8),
-                "hold_amount": round(float(hold_amount), 8),
-                "actual_profit": round(float(actual_profit), 8),
-                "btc_alternative_profit": round(float(btc_alternative_profit), 8),
-                "difference": round(float(difference), 8),
-                "better_than_btc": difference >= 0
-            }
-            btc_results.append(result)
+            difference = actual_profit - btc_alternative_profit
+        else:
+            start_time = None
+            btc_alternative_profit = 0
+            difference = 0
         
-        return {
-            "roi_comparison": roi_results,
-            "vs_btc_comparison": btc_results
+        result = {
+            "ticker": ticker,
+            "start_time": start_time,
+            "total_buys": round(float(total_buys), 8),
+            "total_sells": round(float(total_sells), 8),
+            "hold_amount": round(float(hold_amount), 8),
+            "actual_profit": round(float(actual_profit), 8),
+            "btc_alternative_profit": round(float(btc_alternative_profit), 8),
+            "difference": round(float(difference), 8),
+            "better_than_btc": difference >= 0
         }
+        btc_results.append(result)
     
-    finally:
-        # Clean up temp file
-        if os.path.exists(temp_file):
-            os.remove(temp_file)
+    return {
+        "roi_comparison": roi_results,
+        "vs_btc_comparison": btc_results
+    }
 
-def save_profit_and_comparison_by_date(end_date_str):
+def save_profit_and_comparison_by_date(end_date_str, trade_book=None, snapshot=None, hold=None):
     """Calculate and save profit and comparison data for a specific date
     
     Args:
         end_date_str: End date in format "YYYY-MM-DD" or "YYYYMMDD"
+        trade_book: TradeBook of all trades (optional, will load if not provided)
+        snapshot: TradeSnapshot for end_date_str from sweep_trade_snapshots (optional)
+        hold: Holdings at the end date (optional, see get_hold_at_date)
     """
-    # Format date string for filename
+    # Format date string for the comparison range name
     if len(end_date_str) == 8:  # YYYYMMDD
         date_key = end_date_str
     else:  # YYYY-MM-DD
         date_key = end_date_str.replace("-", "")
     
+    # Index trade history and look up holdings once for both calculations
+    if trade_book is None:
+        trade_book = load_trade_book("alltime")
+    if hold is None:
+        hold = get_hold_at_date(end_date_str, trade_book=trade_book)
+    
     # Calculate profit
-    profit_results = calculate_profit_by_date(end_date_str)
+    profit_results = calculate_profit_by_date(end_date_str, trade_book=trade_book, snapshot=snapshot, hold=hold)
     
     if not profit_results:
         print(f"\nNo data to save for {end_date_str}")
         return
     
     # Save profit data
-    os.makedirs("./profit_history", exist_ok=True)
-    profit_file = f"./profit_history/profit_begin_{date_key}.json"
-    with open(profit_file, "w") as f:
-        json.dump(profit_results, f, indent=4)
-    print(f"\n✅ Profit data saved to {profit_file}")
+    save_snapshot(end_date_str, profit_results=profit_results)
+    print(f"\n✅ Profit data for {end_date_str} saved to {STORE_PATH}")
     
     # Calculate comparison
-    comparison_results = calculate_comparison_by_date(end_date_str, profit_results)
+    comparison_results = calculate_comparison_by_date(end_date_str, profit_results, trade_book=trade_book, snapshot=snapshot, hold=hold)
     
     if comparison_results:
         # Save comparison data
-        os.makedirs("./comparison", exist_ok=True)
-        comparison_file = f"./comparison/comparison_begin_{date_key}.json"
-        
         combined = {
             "range": f"begin_{date_key}",
             "end_date": end_date_str,
@@ -475,9 +557,8 @@ def save_profit_and_comparison_by_date(end_date_str):
             "vs_btc_comparison": comparison_results["vs_btc_comparison"]
         }
         
-        with open(comparison_file, "w") as f:
-            json.dump(combined, f, indent=4)
-        print(f"✅ Comparison data saved to {comparison_file}")
+        save_snapshot(end_date_str, comparison=combined)
+        print(f"✅ Comparison data for {end_date_str} saved to {STORE_PATH}")
     
     print(f"\n{'='*70}")
     print(f"All data saved successfully for date: {end_date_str}")
@@ -1,105 +1,220 @@
 import json
 import os
-import requests
-from datetime import datetime, timezone, timedelta
-from utils import build_jwt
+import threading
+import time
+import weakref
+from datetime import datetime, timezone
+from coinbase_client import api_get, fetch_concurrently, print_client_stats
+from trade_book import TradeBook
+from holdings import get_holdings_snapshot
+from price_snapshot import get_price_snapshot, get_current_price
+from price_resolver import PriceResolver, SOURCE_CANDLE, SOURCE_FIRST_TRADE
+from utils import write_json_atomic, load_json_records
+from trade_store import load_or_build_trade_columns
+from profit_engine import calculate_all_profits
+from price_cache import CACHE_MISS, GRANULARITY_SECONDS, FINALIZE_DELAY_SECONDS, get_cached_open, count_lookup, count_cached, store_candles, print_cache_stats
+
+# Largest number of candles the candles endpoint returns per request
+MAX_CANDLES_PER_REQUEST = 350
 
 # ==================== API Call Functions ====================
 
 def get_hold():
-    """Get current holdings"""
-    request_method = "GET"
-    request_host = "api.coinbase.com"
-    request_path = "/api/v3/brokerage/accounts"
-    uri = f"{request_method} {request_host}{request_path}"
-    jwt_token = build_jwt(uri)
-    headers = {
-        "Authorization": f"Bearer {jwt_token}",
-        "Content-Type": "application/json",
-    }
-    url = f"https://{request_host}{request_path}"
-    response = requests.get(url, headers=headers)
-    response = response.json()
-    hold_result = {}
-    for account in response.get("accounts", []):
-        balance = float(account.get("available_balance", {}).get("value", 0)) + float(account.get("hold", {}).get("value", 0))
-        if balance > 0:
-            hold_result[account.get("currency")] = {
-                "ticker": account.get("currency"),
-                "hold": round(balance, 8),
-            }
-    return hold_result
+    """Get current holdings
+    
+    The accounts API is called once per run; later calls return the same
+    snapshot (see holdings.get_holdings_snapshot).
+    """
+    return get_holdings_snapshot()["hold"]
 
 def get_price(ticker):
-    """Get current price"""
-    request_method = "GET"
-    request_host = "api.coinbase.com"
-    request_path = f"/api/v3/brokerage/products/{ticker}"
-    uri = f"{request_method} {request_host}{request_path}"
-    jwt_token = build_jwt(uri)
-    headers = {
-        "Authorization": f"Bearer {jwt_token}",
-        "Content-Type": "application/json",
-    }
-    url = f"https://{request_host}{request_path}"
-    response = requests.get(url, headers=headers)
-    response = response.json()
-    price = float(response.get("price", 0))
-    return price
+    """Get current price (from this run's price snapshot, 0 if unavailable)"""
+    return get_current_price(ticker) or 0
 
 def get_historical_price_from_candles(ticker, timestamp_str):
     """Get historical price at a specific time (minute-level) using candles API
     
+    Finalized candles are served from the local price cache; only misses and
+    the still-open current minute go to the network.
+    
     Args:
         ticker: Trading pair, e.g., "BTC-USDC"
         timestamp_str: ISO format timestamp, e.g., "2025-10-22T00:34:38.959435Z"
     """
-    request_method = "GET"
-    request_host = "api.coinbase.com"
-    
     dt = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
     start_ts = int(dt.timestamp())
     end_ts = start_ts + 60
     
-    request_path = f"/api/v3/brokerage/products/{ticker}/candles"
-    uri = f"{request_method} {request_host}{request_path}"
+    # The API returns candles newest first, so the answer is the newest
+    # non-empty minute starting inside [start_ts, end_ts]. The probes are not
+    # counted one by one; the lookup counts as a single cache hit or miss
+    candle_starts = [s for s in (end_ts // 60 * 60, start_ts) if start_ts <= s <= end_ts and s % 60 == 0]
+    for candle_start in candle_starts:
+        cached_price = get_cached_open(ticker, "ONE_MINUTE", candle_start, count=False)
+        if cached_price is CACHE_MISS and candle_start % 86400 == 0:
+            # The first minute of a day opens at the same price as the daily
+            # candle, which is what prefetch_candle_range stores for backfills
+            cached_price = get_cached_open(ticker, "ONE_DAY", candle_start, count=False)
+        if cached_price is CACHE_MISS:
+            break
+        if cached_price is not None:
+            count_lookup(hit=True)
+            return cached_price
+    else:
+        count_lookup(hit=True)
+        return None
+    count_lookup(hit=False)
     
-    jwt_token = build_jwt(uri)
-    headers = {
-        "Authorization": f"Bearer {jwt_token}",
-        "Content-Type": "application/json",
-    }
-    url = f"https://{request_host}{request_path}"
     querystring = {"start": str(start_ts), "end": str(end_ts), "granularity": "ONE_MINUTE"}
     
     try:
-        response = requests.get(url, headers=headers, params=querystring)
+        response = api_get(f"/api/v3/brokerage/products/{ticker}/candles", params=querystring)
         if response.status_code == 200:
-            response_json = response.json()
-            if "candles" in response_json and len(response_json["candles"]) > 0:
-                candle = response_json["candles"][0]
+            candles = response.json().get("candles", [])
+            returned_starts = {int(candle["start"]) for candle in candles}
+            store_candles(ticker, "ONE_MINUTE", candles,
+                          empty_starts=[s for s in candle_starts if s not in returned_starts])
+            if len(candles) > 0:
+                candle = candles[0]
                 return float(candle["open"])
+        else:
+            print(f"  Failed to get historical price for {ticker} at {timestamp_str}: HTTP {response.status_code}")
     except Exception as e:
         print(f"  Failed to get historical price for {ticker} at {timestamp_str}: {e}")
     
     return None
 
+def prefetch_candle_range(ticker, start_ts, end_ts, granularity="ONE_DAY"):
+    """Fetch every candle in [start_ts, end_ts] into the price cache
+    
+    The range is split into the largest windows the candles endpoint allows,
+    and windows that are already fully cached are skipped. The range ends at
+    the last finished candle: a candle that is still open would not be
+    cached, so requesting it would only repeat the request on every run.
+    
+    Args:
+        ticker: Trading pair, e.g., "BTC-USDC"
+        start_ts: Range start as epoch seconds
+        end_ts: Range end as epoch seconds
+        granularity: Candle granularity, e.g., "ONE_DAY" or "ONE_MINUTE"
+    
+    Returns:
+        int: Number of API requests made
+    """
+    step = GRANULARITY_SECONDS[granularity]
+    first_start = -(-int(start_ts) // step) * step  # Round up to a candle boundary
+    last_finished_start = (int(time.time()) - FINALIZE_DELAY_SECONDS) // step * step - step
+    last_start = min(int(end_ts) // step * step, last_finished_start)
+    
+    requests_made = 0
+    chunk_start = first_start
+    while chunk_start <= last_start:
+        chunk_end = min(chunk_start + (MAX_CANDLES_PER_REQUEST - 1) * step, last_start)
+        expected = (chunk_end - chunk_start) // step + 1
+        
+        if count_cached(ticker, granularity, chunk_start, chunk_end) < expected:
+            querystring = {"start": str(chunk_start), "end": str(chunk_end), "granularity": granularity}
+            try:
+                response = api_get(f"/api/v3/brokerage/products/{ticker}/candles", params=querystring)
+                requests_made += 1
+                if response.status_code == 200:
+                    candles = response.json().get("candles", [])
+                    returned_starts = {int(candle["start"]) for candle in candles}
+                    store_candles(ticker, granularity, candles,
+                                  empty_starts=[s for s in range(chunk_start, chunk_end + 1, step) if s not in returned_starts])
+                else:
+                    print(f"  Failed to prefetch {granularity} candles for {ticker}: HTTP {response.status_code}")
+            except Exception as e:
+                print(f"  Failed to prefetch {granularity} candles for {ticker}: {e}")
+        
+        chunk_start = chunk_end + step
+    
+    return requests_made
+
+def prefetch_historical_prices(lookups):
+    """Look up many (ticker, timestamp) prices concurrently
+    
+    Results land in the price cache, so later get_historical_price_from_candles
+    calls for the same lookups are answered locally.
+    
+    Args:
+        lookups: Iterable of (ticker, timestamp_str) tuples
+    
+    Returns:
+        dict: Mapping (ticker, timestamp_str) to price (or None)
+    """
+    return fetch_concurrently(lambda lookup: get_historical_price_from_candles(*lookup), lookups)
+
 # ==================== Data Loading and Processing Functions ====================
 
+class FrozenTrade(dict):
+    """Read-only trade record shared between all callers of load_trade_history"""
+    
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("trade records returned by load_trade_history are read-only")
+    
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _readonly
+
+# path -> ((mtime_ns, size), trades, trade_book)
+_trade_history_cache = {}
+_trade_history_stats = {"parses": 0, "reused": 0}
+_trade_history_lock = threading.Lock()
+
+def _load_cached_trade_history(path):
+    """Parse a trade history file, or reuse the parsed copy if the file is unchanged"""
+    stat = os.stat(path)
+    file_key = (stat.st_mtime_ns, stat.st_size)
+    with _trade_history_lock:
+        cached = _trade_history_cache.get(path)
+        if cached and cached[0] == file_key:
+            _trade_history_stats["reused"] += 1
+            return cached
+        trades = tuple(load_json_records(path, object_hook=FrozenTrade))
+        cached = [file_key, trades, None]
+        _trade_history_cache[path] = cached
+        _trade_history_stats["parses"] += 1
+        return cached
+
 def load_trade_history(range="alltime"):
-    """Load trade history"""
-    with open(f"./trade_history/filled_{range}.json", "r") as f:
-        return json.load(f)
+    """Load trade history
+    
+    The parsed file is kept in memory and reused until its mtime or size
+    changes. The returned tuple and its records are read-only.
+    """
+    return _load_cached_trade_history(f"./trade_history/filled_{range}.json")[1]
+
+def load_trade_book(range="alltime"):
+    """Load trade history and index it by ticker (shared while the file is unchanged)"""
+    cached = _load_cached_trade_history(f"./trade_history/filled_{range}.json")
+    with _trade_history_lock:
+        if cached[2] is None:
+            cached[2] = TradeBook(cached[1])
+        return cached[2]
+
+# TradeBook -> PriceResolver, dropped together with the book
+_price_resolvers = weakref.WeakKeyDictionary()
+
+def get_price_resolver(trade_book):
+    """Get the run's PriceResolver for a trade book (shared by every calculator)"""
+    with _trade_history_lock:
+        if trade_book not in _price_resolvers:
+            _price_resolvers[trade_book] = PriceResolver(trade_book, get_historical_price_from_candles)
+        return _price_resolvers[trade_book]
+
+def get_trade_history_stats():
+    """Get counts of trade history files parsed and parses avoided by the cache
+    
+    Returns:
+        dict: Dictionary containing parses and reused
+    """
+    with _trade_history_lock:
+        return dict(_trade_history_stats)
 
-def get_all_tickers(range="alltime", hold=None):
+def get_all_tickers(range="alltime", hold=None, trade_book=None):
     """Get list of all traded coins"""
-    trade_history = load_trade_history(range)
-    tickers = set(trade["product_id"] for trade in trade_history)
-    all_tickers = []
-    for ticker in tickers:
-        if ticker.endswith("-USDC") or ticker.endswith("-USD"):
-            coin = ticker.split("-")[0]
-            all_tickers.append(coin)
+    if trade_book is None:
+        trade_book = load_trade_book(range)
+    all_tickers = list(set(trade_book.get_all_coins()))
     
     if hold:
         all_tickers = list(set(all_tickers).union(hold.keys()))
@@ -109,40 +224,16 @@ def get_all_tickers(range="alltime", hold=None):
 def extract_ticker_trades(trade_history, ticker):
     """Extract trade data for a specific ticker from trade history
     
+    Args:
+        trade_history: TradeBook, or a list of trades (indexed on the fly)
+        ticker: Trading pair
+    
     Returns:
         dict: Dictionary containing buys, sells, buy_sizes, sell_sizes, buy_times
     """
-    buys = []
-    sells = []
-    buy_sizes = []
-    sell_sizes = []
-    buy_times = []
-    
-    for trade in trade_history:
-        if trade["product_id"] == ticker:
-            price = float(trade["price"])
-            size = float(trade["size"])
-            commission = float(trade["commission"])
-            
-            if trade["side"] == "BUY":
-                buys.append(price * size + commission)
-                buy_sizes.append(size)
-                buy_times.append(trade["trade_time"])
-            elif trade["side"] == "SELL":
-                sells.append(price * size - commission)
-                sell_sizes.append(size)
-    
-    return {
-        "buys": buys,
-        "sells": sells,
-        "buy_sizes": buy_sizes,
-        "sell_sizes": sell_sizes,
-        "buy_times": buy_times,
-        "total_buys": sum(buys),
-        "total_sells": sum(sells),
-        "total_buy_size": sum(buy_sizes),
-        "total_sell_size": sum(sell_sizes),
-    }
+    if not isinstance(trade_history, TradeBook):
+        trade_history = TradeBook(trade_history)
+    return trade_history.extract(ticker)
 
 def calculate_profit_components(trades_data, hold, current_price=None):
     """Calculate realized and unrealized profits
@@ -188,13 +279,13 @@ def calculate_profit_components(trades_data, hold, current_price=None):
 
 # ==================== Core Calculation Functions ====================
 
-def calculate_profit(range, ticker, hold):
+def calculate_profit(range, ticker, hold, trade_book=None):
     """Calculate profit for a single coin"""
-    trade_history = load_trade_history(range)
-    trades_data = extract_ticker_trades(trade_history, ticker)
+    if trade_book is None:
+        trade_book = load_trade_book(range)
+    trades_data = trade_book.extract(ticker)
     
-    # current_price = get_price(ticker) if hold > 0 else 0
-    current_price = get_historical_price_from_candles(ticker, (datetime.now(timezone.utc) - timedelta(minutes=5)).replace(microsecond=0).isoformat().replace("+00:00", "Z")) if hold > 0 else 0
+    current_price = get_current_price(ticker) if hold > 0 else 0
     profit_components = calculate_profit_components(trades_data, hold, current_price)
     
     return {
@@ -207,7 +298,24 @@ def calculate_profit(range, ticker, hold):
         "total_profit": round(float(profit_components["total_profit"]), 8),
     }
 
-def calculate_ticker_roi(range, ticker, hold, profit_data=None):
+def calculate_profit_all_coins(range, coins, hold):
+    """Calculate profit for many coins at once with the vectorized engine
+    
+    Args:
+        range: Time range for data
+        coins: Coins to calculate, e.g., ["BTC", "ETH"]
+        hold: Holdings as returned by get_hold()
+    
+    Returns:
+        List of results in the same order as coins (see calculate_profit)
+    """
+    columns = load_or_build_trade_columns(range)
+    tickers = [f"{coin}-USDC" for coin in coins]
+    holds = {f"{coin}-USDC": hold.get(coin, {}).get("hold", 0) for coin in coins}
+    prices = get_price_snapshot([ticker for ticker in tickers if holds[ticker] > 0 and ticker != "USDC-USDC"])["prices"]
+    return calculate_all_profits(columns, tickers, holds, prices)
+
+def calculate_ticker_roi(range, ticker, hold, profit_data=None, trade_book=None):
     """Calculate price change vs trading ROI comparison for a single coin
     
     Args:
@@ -215,20 +323,20 @@ def calculate_ticker_roi(range, ticker, hold, profit_data=None):
         ticker: Trading pair
         hold: Current holding amount
         profit_data: Pre-calculated profit data (optional, will load if not provided)
+        trade_book: Pre-built TradeBook (optional, will load if not provided)
     """
-    trade_history = load_trade_history(range)
-    trades_data = extract_ticker_trades(trade_history, ticker)
+    if trade_book is None:
+        trade_book = load_trade_book(range)
+    trades_data = trade_book.extract(ticker)
+    
+    price_resolver = get_price_resolver(trade_book)
     
     # Get current price (needed for price change calculation)
-    current_price = get_historical_price_from_candles(ticker, (datetime.now(timezone.utc) - timedelta(minutes=5)).replace(microsecond=0).isoformat().replace("+00:00", "Z")) if hold > 0 else 0
+    current_price = price_resolver.current_price(ticker) if hold > 0 else 0
     
     # Fallback to trade price if current price couldn't be fetched
     if current_price is None or current_price == 0:
-        ticker_trades = sorted([t for t in trade_history if t["product_id"] == ticker], key=lambda x: x["trade_time"])
-        if ticker_trades:
-            current_price = float(ticker_trades[-1]["price"])  # Use last trade price
-        else:
-            current_price = 0
+        current_price = trades_data["last_price"] or 0  # Use last trade price
     
     # Use provided profit data or calculate it
     if profit_data:
@@ -262,17 +370,11 @@ def calculate_ticker_roi(range, ticker, hold, profit_data=None):
         trading_roi_percent = 0
     
     # Get start price
-    start_time = min(trades_data["buy_times"]) if trades_data["buy_times"] else None
+    start_time = trades_data["first_buy_time"]
     start_price = None
     
     if start_time:
-        start_price = get_historical_price_from_candles(ticker, start_time)
-        if not start_price:
-            ticker_trades = sorted([t for t in trade_history if t["product_id"] == ticker], key=lambda x: x["trade_time"])
-            if ticker_trades:
-                start_price = float(ticker_trades[0]["price"])
-            else:
-                start_price = current_price
+        start_price = price_resolver.price_at(ticker, start_time, fallback=SOURCE_FIRST_TRADE)
     else:
         start_price = current_price
     
@@ -308,7 +410,7 @@ def calculate_ticker_roi(range, ticker, hold, profit_data=None):
         "beat_hodl": performance_diff >= 0
     }
 
-def calculate_ticker_vs_btc(range, ticker, hold, start_time=None, profit_data=None):
+def calculate_ticker_vs_btc(range, ticker, hold, start_time=None, profit_data=None, trade_book=None):
     """Calculate actual profit of a single coin vs if invested in BTC
     
     Args:
@@ -317,9 +419,12 @@ def calculate_ticker_vs_btc(range, ticker, hold, start_time=None, profit_data=No
         hold: Current holding amount
         start_time: Optional unified start time
         profit_data: Pre-calculated profit data (optional, will load if not provided)
+        trade_book: Pre-built TradeBook (optional, will load if not provided)
     """
-    trade_history = load_trade_history(range)
-    trades_data = extract_ticker_trades(trade_history, ticker)
+    if trade_book is None:
+        trade_book = load_trade_book(range)
+    trades_data = trade_book.extract(ticker)
+    price_resolver = get_price_resolver(trade_book)
     
     # Use provided profit data or calculate it
     if profit_data:
@@ -327,26 +432,19 @@ def calculate_ticker_vs_btc(range, ticker, hold, start_time=None, profit_data=No
         total_buys = profit_data["total_buys"]
         total_sells = profit_data["total_sells"]
     else:
-        current_price = get_historical_price_from_candles(ticker, (datetime.now(timezone.utc) - timedelta(minutes=5)).replace(microsecond=0).isoformat().replace("+00:00", "Z")) if hold > 0 else 0
+        current_price = price_resolver.current_price(ticker) if hold > 0 else 0
         profit_components = calculate_profit_components(trades_data, hold, current_price)
         actual_profit = profit_components["total_profit"]
         total_buys = trades_data["total_buys"]
         total_sells = trades_data["total_sells"]
     
     # Calculate profit if invested in BTC
-    if trades_data["buy_times"] and trades_data["total_buys"] > 0:
+    if trades_data["first_buy_time"] and trades_data["total_buys"] > 0:
         if start_time is None:
-            start_time = min(trades_data["buy_times"])
-        
-        btc_price_start = get_historical_price_from_candles("BTC-USDC", start_time)
-        if not btc_price_start:
-            btc_trades = sorted([t for t in trade_history if t["product_id"] == "BTC-USDC"], key=lambda x: x["trade_time"])
-            if btc_trades:
-                btc_price_start = float(btc_trades[0]["price"])
-            else:
-                btc_price_start = get_price("BTC-USDC")
+            start_time = trades_data["first_buy_time"]
         
-        btc_price_current = get_historical_price_from_candles("BTC-USDC", (datetime.now(timezone.utc) - timedelta(minutes=5)).replace(microsecond=0).isoformat().replace("+00:00", "Z"))
+        btc_price_start = price_resolver.price_at("BTC-USDC", start_time, fallback=SOURCE_FIRST_TRADE)
+        btc_price_current = price_resolver.current_price("BTC-USDC")
         
         net_investment = trades_data["total_buys"] - trades_data["total_sells"]
         btc_amount = trades_data["total_buys"] / btc_price_start
@@ -372,39 +470,36 @@ def calculate_ticker_vs_btc(range, ticker, hold, start_time=None, profit_data=No
         "better_than_btc": difference >= 0
     }
 
-def calculate_btc_baseline(start_time=None):
+def calculate_btc_baseline(start_time=None, trade_book=None):
     """Calculate BTC baseline comparison if all investments were in BTC"""
     range = "alltime"
-    trade_history = load_trade_history(range)
+    if trade_book is None:
+        trade_book = load_trade_book(range)
     
-    trades_sorted = sorted(trade_history, key=lambda x: x["trade_time"])
-    earliest_time = trades_sorted[0]["trade_time"] if trades_sorted else None
+    earliest_time = trade_book.fills[0].trade_time if trade_book.fills else None
     
     if start_time is None:
         start_time = earliest_time
     
     print(f"\nGetting BTC price at {start_time}...")
-    btc_price_start = get_historical_price_from_candles("BTC-USDC", start_time)
+    price_resolver = get_price_resolver(trade_book)
+    btc_price_start = price_resolver.price_at("BTC-USDC", start_time, fallback=SOURCE_FIRST_TRADE)
     
-    if not btc_price_start:
-        print(f"  ⚠️  Unable to get historical price, using first BTC trade price")
-        btc_trades = [t for t in trades_sorted if t["product_id"] == "BTC-USDC"]
-        if btc_trades:
-            btc_price_start = float(btc_trades[0]["price"])
-        else:
-            btc_price_start = get_price("BTC-USDC")
+    source = price_resolver.get_source("BTC-USDC", start_time, fallback=SOURCE_FIRST_TRADE)
+    if source != SOURCE_CANDLE:
+        print(f"  ⚠️  Unable to get historical price, using {source.replace('_', ' ')} price")
     else:
         print(f"  ✅ BTC Price (@{start_time}): ${btc_price_start:,.2f}")
     
     # Calculate total net investment
     total_net_investment = 0
-    for trade in trade_history:
-        if trade["side"] == "BUY":
-            total_net_investment += float(trade["price"]) * float(trade["size"]) + float(trade["commission"])
-        elif trade["side"] == "SELL":
-            total_net_investment -= float(trade["price"]) * float(trade["size"]) - float(trade["commission"])
+    for fill in trade_book.fills:
+        if fill.side == "BUY":
+            total_net_investment += fill.price * fill.size + fill.commission
+        elif fill.side == "SELL":
+            total_net_investment -= fill.price * fill.size - fill.commission
     
-    btc_price_current = get_historical_price_from_candles("BTC-USDC", (datetime.now(timezone.utc) - timedelta(minutes=5)).replace(microsecond=0).isoformat().replace("+00:00", "Z"))
+    btc_price_current = price_resolver.current_price("BTC-USDC")
     btc_amount = total_net_investment / btc_price_start
     btc_current_value = btc_amount * btc_price_current
     btc_profit = btc_current_value - total_net_investment
@@ -423,13 +518,18 @@ def calculate_btc_baseline(start_time=None):
 
 # ==================== Display Functions ====================
 
-def all_time_profit():
-    """Display profit information for all coins"""
+def all_time_profit(hold=None):
+    """Display profit information for all coins
+    
+    Args:
+        hold: Holdings as returned by get_hold() (optional, will fetch if not provided)
+    """
     range = "alltime"
-    hold = get_hold()
-    all_tickers = get_all_tickers(range, hold)
+    if hold is None:
+        hold = get_hold()
+    trade_book = load_trade_book(range)
+    all_tickers = get_all_tickers(range, hold, trade_book=trade_book)
     
-    results = []
     total_realized = 0
     total_unrealized = 0
     total_profit = 0
@@ -437,11 +537,8 @@ def all_time_profit():
     print(f"\n{'Coin':<10} {'Realized':<15} {'Unrealized':<15} {'Total':<15}")
     print("-" * 60)
     
-    for coin in all_tickers:
-        ticker = f"{coin}-USDC"
-        result = calculate_profit(range, ticker, hold.get(coin, {}).get("hold", 0))
-        results.append(result)
-        
+    results = calculate_profit_all_coins(range, all_tickers, hold)
+    for coin, result in zip(all_tickers, results):
         print(f"{coin:<10} ${result['realized_profit']:>13.2f} ${result['unrealized_profit']:>13.2f} ${result['total_profit']:>13.2f}")
         
         total_realized += result["realized_profit"]
@@ -451,19 +548,21 @@ def all_time_profit():
     print("-" * 60)
     print(f"{'TOTAL':<10} ${total_realized:>13.2f} ${total_unrealized:>13.2f} ${total_profit:>13.2f}")
     
-    # Create directory if it doesn't exist
-    os.makedirs("./profit_history", exist_ok=True)
-    
-    with open(f"./profit_history/profit_{range}.json", "w") as f:
-        json.dump(results, f, indent=4)
+    write_json_atomic(f"./profit_history/profit_{range}.json", results)
 
-def print_btc_baseline_comparison():
-    """Print BTC baseline comparison"""
+def print_btc_baseline_comparison(hold=None):
+    """Print BTC baseline comparison
+    
+    Args:
+        hold: Holdings as returned by get_hold() (optional, will fetch if not provided)
+    """
     print("\n" + "=" * 70)
     print("BTC BASELINE COMPARISON (If All Investments Were in BTC)")
     print("=" * 70)
     
-    baseline = calculate_btc_baseline()
+    range = "alltime"
+    trade_book = load_trade_book(range)
+    baseline = calculate_btc_baseline(trade_book=trade_book)
     
     print(f"\nEarliest Trade Time: {baseline['earliest_time']}")
     print(f"Comparison Start Time: {baseline['start_time']}")
@@ -477,14 +576,12 @@ def print_btc_baseline_comparison():
     print(f"  ROI: {baseline['btc_roi_percent']:.2f}%")
     
     # Get actual total profit
-    range = "alltime"
-    hold = get_hold()
-    all_tickers = get_all_tickers(range, hold)
+    if hold is None:
+        hold = get_hold()
+    all_tickers = get_all_tickers(range, hold, trade_book=trade_book)
     
     actual_total_profit = 0
-    for coin in all_tickers:
-        ticker = f"{coin}-USDC"
-        result = calculate_profit(range, ticker, hold.get(coin, {}).get("hold", 0))
+    for result in calculate_profit_all_coins(range, all_tickers, hold):
         actual_total_profit += result["total_profit"]
     
     print(f"\nActual Trading Strategy:")
@@ -496,12 +593,13 @@ def print_btc_baseline_comparison():
     print(f"Difference: ${difference:,.2f} ({'+' if difference > 0 else ''}{(difference / baseline['btc_profit'] * 100) if baseline['btc_profit'] != 0 else 0:.2f}%)")
     print("=" * 70)
 
-def print_ticker_vs_btc_comparison(start_time=None, range="alltime"):
+def print_ticker_vs_btc_comparison(start_time=None, range="alltime", hold=None):
     """Print comparison of each ticker vs BTC
     
     Args:
         start_time: Optional unified start time
         range: Time range for data (default: "alltime")
+        hold: Holdings as returned by get_hold() (optional, will fetch if not provided)
     """
     print("\n" + "=" * 90)
     if start_time:
@@ -522,8 +620,20 @@ def print_ticker_vs_btc_comparison(start_time=None, range="alltime"):
     # Create a dict for quick lookup
     profit_dict = {item["ticker"]: item for item in profit_data_list}
     
-    hold = get_hold()
-    all_tickers = get_all_tickers(range, hold)
+    if hold is None:
+        hold = get_hold()
+    trade_book = load_trade_book(range)
+    all_tickers = get_all_tickers(range, hold, trade_book=trade_book)
+    
+    # Quote current prices in one batch and fetch all BTC start prices at once
+    get_price_snapshot(["BTC-USDC"] + [f"{coin}-USDC" for coin in all_tickers
+                                       if coin != "USDC" and hold.get(coin, {}).get("hold", 0) > 0])
+    lookups = []
+    for coin in all_tickers:
+        coin_start_time = start_time or trade_book.extract(f"{coin}-USDC")["first_buy_time"]
+        if coin != "USDC" and coin_start_time:
+            lookups.append(("BTC-USDC", coin_start_time))
+    prefetch_historical_prices(lookups)
     
     print(f"\n{'Coin':<10} {'Start Time':<22} {'Actual':<15} {'If BTC':<15} {'Diff':<15} {'Better?':<10}")
     print("-" * 100)
@@ -534,7 +644,7 @@ def print_ticker_vs_btc_comparison(start_time=None, range="alltime"):
             continue
         ticker = f"{coin}-USDC"
         profit_data = profit_dict.get(ticker)
-        result = calculate_ticker_vs_btc(range, ticker, hold.get(coin, {}).get("hold", 0), start_time, profit_data=profit_data)
+        result = calculate_ticker_vs_btc(range, ticker, hold.get(coin, {}).get("hold", 0), start_time, profit_data=profit_data, trade_book=trade_book)
         comparisons.append(result)
         
         symbol = "✅" if result["better_than_btc"] else "❌"
@@ -550,11 +660,12 @@ def print_ticker_vs_btc_comparison(start_time=None, range="alltime"):
     
     return comparisons
 
-def print_ticker_roi_comparison(range="alltime"):
+def print_ticker_roi_comparison(range="alltime", hold=None):
     """Print comparison of each ticker's price change vs trading performance
     
     Args:
         range: Time range for data (default: "alltime")
+        hold: Holdings as returned by get_hold() (optional, will fetch if not provided)
     """
     print("\n" + "=" * 130)
     print("TICKER PRICE vs TRADING PERFORMANCE (Price Change vs My Trading Performance)")
@@ -572,8 +683,20 @@ def print_ticker_roi_comparison(range="alltime"):
     # Create a dict for quick lookup
     profit_dict = {item["ticker"]: item for item in profit_data_list}
     
-    hold = get_hold()
-    all_tickers = get_all_tickers(range, hold)
+    if hold is None:
+        hold = get_hold()
+    trade_book = load_trade_book(range)
+    all_tickers = get_all_tickers(range, hold, trade_book=trade_book)
+    
+    # Quote current prices in one batch and fetch every coin's start price at once
+    get_price_snapshot([f"{coin}-USDC" for coin in all_tickers
+                        if coin != "USDC" and hold.get(coin, {}).get("hold", 0) > 0])
+    lookups = []
+    for coin in all_tickers:
+        ticker = f"{coin}-USDC"
+        if coin != "USDC" and trade_book.extract(ticker)["first_buy_time"]:
+            lookups.append((ticker, trade_book.extract(ticker)["first_buy_time"]))
+    prefetch_historical_prices(lookups)
     
     print(f"\n{'Coin':<10} {'Start Time':<22} {'Start $':<12} {'Current $':<12} {'Price Change':<12} {'Net Investment':<15} {'My ROI':<12} {'Difference':<12} {'Status':<10}")
     print("-" * 130)
@@ -584,7 +707,7 @@ def print_ticker_roi_comparison(range="alltime"):
             continue
         ticker = f"{coin}-USDC"
         profit_data = profit_dict.get(ticker)
-        result = calculate_ticker_roi(range, ticker, hold.get(coin, {}).get("hold", 0), profit_data=profit_data)
+        result = calculate_ticker_roi(range, ticker, hold.get(coin, {}).get("hold", 0), profit_data=profit_data, trade_book=trade_book)
         roi_results.append(result)
         
         start_time_display = result.get('start_time', 'N/A')[:19] if result.get('start_time') else 'N/A'
@@ -631,18 +754,22 @@ def print_ticker_roi_comparison(range="alltime"):
     
     return roi_results
 
-def save_comparison_data(range="alltime", start_time=None):
+def save_comparison_data(range="alltime", start_time=None, hold=None):
     """Generate and save combined comparison data (ROI + vs BTC)
     
     Args:
         range: Time range for data (default: "alltime")
         start_time: Optional unified start time for BTC comparison
+        hold: Holdings as returned by get_hold() (optional, will fetch if not provided)
     """
+    if hold is None:
+        hold = get_hold()
+    
     # Generate ROI comparison
-    roi_results = print_ticker_roi_comparison(range=range)
+    roi_results = print_ticker_roi_comparison(range=range, hold=hold)
     
     # Generate vs BTC comparison
-    btc_results = print_ticker_vs_btc_comparison(start_time=start_time, range=range)
+    btc_results = print_ticker_vs_btc_comparison(start_time=start_time, range=range, hold=hold)
     
     if roi_results is None or btc_results is None:
         print("\nError: Failed to generate comparison data")
@@ -656,27 +783,38 @@ def save_comparison_data(range="alltime", start_time=None):
         "vs_btc_comparison": btc_results
     }
     
-    # Create comparison directory if it doesn't exist
-    os.makedirs("./comparison", exist_ok=True)
-    
     # Save to file
     output_file = f"./comparison/comparison_{range}.json"
-    with open(output_file, "w") as f:
-        json.dump(combined, f, indent=4)
+    write_json_atomic(output_file, combined)
     
     print(f"\n✅ Comparison data saved to {output_file}")
 
 # ==================== Main Program ====================
 
 if __name__ == "__main__":
+    # Fetch account balances once; every report below uses the same snapshot
+    holdings = get_holdings_snapshot()
+    hold = holdings["hold"]
+    print(f"💼 Holdings snapshot fetched at {holdings['fetched_at']}")
+    
+    # Quote every held coin (and BTC) once; all reports below use the same prices
+    prices = get_price_snapshot(["BTC-USDC"] + [f"{coin}-USDC" for coin in hold if coin != "USDC"])
+    print(f"💱 Price snapshot fetched at {prices['fetched_at']}")
+    
     # Display basic profit information
-    all_time_profit()
+    all_time_profit(hold=hold)
     
     # Display BTC baseline comparison
-    print_btc_baseline_comparison()
+    print_btc_baseline_comparison(hold=hold)
     
     # Generate and save combined comparison data
-    save_comparison_data(range="alltime")
+    save_comparison_data(range="alltime", hold=hold)
+    
+    print_cache_stats()
+    print_client_stats()
+    get_price_resolver(load_trade_book("alltime")).print_source_counts()
+    trade_history_stats = get_trade_history_stats()
+    print(f"📂 Trade history: parsed {trade_history_stats['parses']} time(s), reused {trade_history_stats['reused']} time(s)")
     
     # Method 2: Use specified unified start time
     # unified_start_time = "2025-10-22T00:34:38.959435Z"
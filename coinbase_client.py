@@ -0,0 +1,163 @@
+"""
+Shared HTTP client for the Coinbase Advanced Trade API
+
+All API calls go through one pooled requests.Session, so connections are
+kept alive and reused instead of paying a new TCP/TLS handshake per call.
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils import build_jwt
+import rate_limiter
+
+API_HOST = "api.coinbase.com"
+
+# Enough pooled connections for the largest worker pool we run
+POOL_SIZE = 32
+DEFAULT_MAX_WORKERS = 8
+
+# Retry policy for throttled (429) and transient server (5xx) responses
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 5
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 30
+REQUEST_TIMEOUT_SECONDS = 30
+
+_session = None
+_stats_lock = threading.Lock()
+_stats = {"requests": 0, "retries": 0, "throttled": 0, "server_errors": 0, "network_errors": 0, "failed": 0, "backoff_seconds": 0.0}
+
+
+def get_session():
+    """Get the shared session, creating it on first use"""
+    global _session
+    if _session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+        session.mount("https://", adapter)
+        _session = session
+    return _session
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def get_retry_delay(attempt, response=None):
+    """Seconds to wait before retry number `attempt` (starting at 0)
+
+    Follows the Retry-After header when the server sends one, otherwise uses
+    exponential backoff with full jitter.
+    """
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            return min(max(float(retry_after), 0.0), BACKOFF_MAX_SECONDS)
+        except ValueError:
+            try:
+                return min(max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0.0), BACKOFF_MAX_SECONDS)
+            except (TypeError, ValueError):
+                pass
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+def api_get(request_path, params=None):
+    """Send an authenticated GET request to the Coinbase API
+
+    Throttled (429) and transient server errors (5xx, dropped connections)
+    are retried up to MAX_RETRIES times with backoff.
+
+    Args:
+        request_path: API path, e.g., "/api/v3/brokerage/accounts"
+        params: Query parameters (optional)
+
+    Returns:
+        requests.Response (the last one if every retry failed)
+
+    Raises:
+        requests.RequestException: If the request still fails at the network level after all retries
+    """
+    uri = f"GET {API_HOST}{request_path}"
+
+    attempt = 0
+    while True:
+        headers = {
+            "Authorization": f"Bearer {build_jwt(uri)}",
+            "Content-Type": "application/json",
+        }
+        rate_limiter.API_RATE_LIMITER.acquire()
+        _count("requests")
+        response = None
+        try:
+            response = get_session().get(f"https://{API_HOST}{request_path}", headers=headers, params=params,
+                                         timeout=REQUEST_TIMEOUT_SECONDS)
+        except (requests.ConnectionError, requests.Timeout):
+            _count("network_errors")
+            if attempt >= MAX_RETRIES:
+                _count("failed")
+                raise
+        else:
+            if response.status_code not in RETRY_STATUS_CODES:
+                return response
+            _count("throttled" if response.status_code == 429 else "server_errors")
+            if attempt >= MAX_RETRIES:
+                _count("failed")
+                return response
+
+        delay = get_retry_delay(attempt, response)
+        _count("retries")
+        _count("backoff_seconds", delay)
+        time.sleep(delay)
+        attempt += 1
+
+
+def get_client_stats():
+    """Get request/retry counters for this process
+
+    Returns:
+        dict: Dictionary containing requests, retries, throttled, server_errors,
+        network_errors, failed and backoff_seconds
+    """
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_client_stats():
+    """Reset request/retry counters"""
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
+
+
+def print_client_stats():
+    """Print a one-line summary of API usage"""
+    stats = get_client_stats()
+    print(f"🌐 API: {stats['requests']} requests, {stats['retries']} retries "
+          f"({stats['throttled']} throttled, {stats['server_errors']} server errors, {stats['network_errors']} network errors), "
+          f"{stats['failed']} failed, {stats['backoff_seconds']:.1f}s backoff")
+
+
+def fetch_concurrently(fetch, items, max_workers=DEFAULT_MAX_WORKERS):
+    """Call fetch(item) for every item at the same time
+
+    Args:
+        fetch: Function taking one item
+        items: Items to fetch (must be hashable)
+        max_workers: Maximum number of requests in flight
+
+    Returns:
+        dict: Mapping item to fetch(item)
+    """
+    items = list(dict.fromkeys(items))
+    if not items:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        return dict(zip(items, executor.map(fetch, items)))
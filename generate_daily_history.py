@@ -3,15 +3,68 @@
 Batch generate profit and comparison data for multiple dates
 """
 
-from datetime import datetime, timedelta, date
-from calculate_profit_by_date import save_profit_and_comparison_by_date
+import io
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, date, timezone
+from calculate_profit_by_date import save_profit_and_comparison_by_date, prefetch_prices_for_dates, sweep_trade_snapshots, get_end_of_day, get_hold_at_date
+from price_cache import print_cache_stats
+from coinbase_client import print_client_stats
+from calculate_profit_history import get_trade_history_stats, load_trade_book, get_price_resolver
+from holdings import get_holdings_snapshot
 
-def generate_daily_history(start_date_str=None, end_date_str=None):
+class ThreadBufferedStdout:
+    """sys.stdout replacement that collects each worker thread's output separately
+    
+    Worker threads call start_buffer()/stop_buffer() around their work; the
+    main thread keeps writing straight through, so per-date output is printed
+    as one block instead of being interleaved.
+    """
+    
+    def __init__(self, stream):
+        self._stream = stream
+        self._local = threading.local()
+    
+    def start_buffer(self):
+        self._local.buffer = io.StringIO()
+    
+    def stop_buffer(self):
+        output = self._local.buffer.getvalue()
+        self._local.buffer = None
+        return output
+    
+    def write(self, text):
+        buffer = getattr(self._local, "buffer", None)
+        return (buffer if buffer is not None else self._stream).write(text)
+    
+    def flush(self):
+        self._stream.flush()
+
+def _process_date_buffered(stdout, date_str, trade_book, snapshot, hold):
+    """Run save_profit_and_comparison_by_date in a worker, capturing its output
+    
+    Returns:
+        tuple: (captured output, exception or None)
+    """
+    stdout.start_buffer()
+    error = None
+    try:
+        save_profit_and_comparison_by_date(date_str, trade_book=trade_book, snapshot=snapshot, hold=hold)
+    except Exception as e:
+        error = e
+    return stdout.stop_buffer(), error
+
+def generate_daily_history(start_date_str=None, end_date_str=None, workers=1, use_saved_holdings=False):
     """Generate profit and comparison data for each day in the date range
     
     Args:
         start_date_str: Start date in format "YYYY-MM-DD". If None, uses 30 days ago
         end_date_str: End date in format "YYYY-MM-DD". If None, uses today
+        workers: Number of dates processed concurrently (default: 1, one after another).
+            API calls from all workers share one rate limiter.
+        use_saved_holdings: If True, value today with the holdings snapshot saved
+            by an earlier run instead of calling the accounts API
     """
     # Default to last 30 days if no dates provided
     if end_date_str is None:
@@ -38,23 +91,73 @@ def generate_daily_history(start_date_str=None, end_date_str=None):
     print(f"From {start_date_str} to {end_date_str}")
     print(f"{'='*70}\n")
     
-    for idx, date_str in enumerate(dates_to_process, 1):
-        print(f"\n[{idx}/{len(dates_to_process)}] Processing {date_str}...")
+    # Load and index trades once; the sweep carries running totals from one date to the next
+    trade_book = load_trade_book("alltime")
+    
+    # Past dates are valued with holdings rebuilt from the fills; only today needs live balances
+    live_hold = None
+    if any(get_end_of_day(date_str) > datetime.now(timezone.utc) for date_str in dates_to_process):
+        holdings = get_holdings_snapshot(use_saved=use_saved_holdings)
+        live_hold = holdings["hold"]
+        print(f"💼 Using holdings snapshot from {holdings['fetched_at']} for today")
+    holds = {date_str: get_hold_at_date(date_str, trade_book, live_hold=live_hold) for date_str in dates_to_process}
+    
+    try:
+        prefetch_prices_for_dates(dates_to_process, trade_book)
+    except Exception as e:
+        print(f"⚠️  Price prefetch failed, falling back to per-date lookups: {e}")
+    
+    snapshots = sweep_trade_snapshots(trade_book, dates_to_process)
+    failed_dates = []
+    
+    if workers <= 1:
+        for idx, (date_str, snapshot) in enumerate(snapshots, 1):
+            print(f"\n[{idx}/{len(dates_to_process)}] Processing {date_str}...")
+            try:
+                save_profit_and_comparison_by_date(date_str, trade_book=trade_book, snapshot=snapshot, hold=holds[date_str])
+            except Exception as e:
+                print(f"❌ Error processing {date_str}: {e}")
+                failed_dates.append(date_str)
+                continue
+    else:
+        print(f"Processing with {workers} workers...")
+        stdout = ThreadBufferedStdout(sys.stdout)
+        sys.stdout = stdout
         try:
-            save_profit_and_comparison_by_date(date_str)
-        except Exception as e:
-            print(f"❌ Error processing {date_str}: {e}")
-            continue
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(_process_date_buffered, stdout, date_str, trade_book, snapshot, holds[date_str]): date_str
+                    for date_str, snapshot in snapshots
+                }
+                for idx, future in enumerate(as_completed(futures), 1):
+                    date_str = futures[future]
+                    output, error = future.result()
+                    print(f"\n[{idx}/{len(dates_to_process)}] Processed {date_str}")
+                    print(output, end="")
+                    if error is not None:
+                        print(f"❌ Error processing {date_str}: {error}")
+                        failed_dates.append(date_str)
+        finally:
+            sys.stdout = stdout._stream
     
     print(f"\n{'='*70}")
     print(f"Batch processing complete!")
     print(f"Processed {len(dates_to_process)} dates")
+    if failed_dates:
+        print(f"❌ Failed dates: {', '.join(sorted(failed_dates))}")
+    print_cache_stats()
+    print_client_stats()
+    get_price_resolver(trade_book).print_source_counts()
+    trade_history_stats = get_trade_history_stats()
+    print(f"📂 Trade history: parsed {trade_history_stats['parses']} time(s), reused {trade_history_stats['reused']} time(s)")
     print(f"{'='*70}\n")
 
 if __name__ == "__main__":
     # By default, generates data for the last 30 days
     # You can specify custom date range:
     # generate_daily_history("2025-10-22", "2025-11-20")
+    # Process several dates at once (API calls stay within the shared rate limit):
+    # generate_daily_history("2025-01-01", "2025-12-31", workers=8)
     
     generate_daily_history()
     
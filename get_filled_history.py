@@ -1,18 +1,274 @@
-import requests
 import json
 import os
 
+from collections import Counter
 from datetime import datetime, timezone
-from utils import build_jwt
+from coinbase_client import api_get
+from utils import write_json_atomic, write_json_records_atomic, iter_json_records, load_json_records, append_json_records, recover_json_records, dumps_compact
+from trade_store import load_trade_columns, is_stale, build_trade_columns, append_trade_columns
 
+TRADE_HISTORY_DIR = "./trade_history"
+# Fills fetched so far by an unfinished alltime sync, one JSON record per line
+PARTIAL_FILE = f"{TRADE_HISTORY_DIR}/filled_alltime.partial.jsonl"
+# Pagination state used to resume an interrupted alltime sync
+SYNC_STATE_FILE = f"{TRADE_HISTORY_DIR}/fills_sync_state.json"
+PAGE_LIMIT = 2000
 
-def get_filled_history(start_date, end_date=None, incremental=False):
+
+def fill_id(trade):
+    """The API's identifier of a fill (entry_id, else trade_id), or None for records saved without one"""
+    return trade.get("entry_id") or trade.get("trade_id")
+
+
+def legacy_trade_key(trade):
+    """Identifier used before fill ids were kept (time + product_id + side + price)"""
+    return (trade["trade_time"], trade["product_id"], trade["side"], trade["price"])
+
+
+def trade_key(trade):
+    """Key recorded for a stored fill: its id, or the legacy key (as a list) if it has none"""
+    return fill_id(trade) or list(legacy_trade_key(trade))
+
+
+def filter_new_trades(known_keys, trades):
+    """Drop the trades that are already stored
+    
+    Fills with an id are matched by id. Fills stored without one are matched
+    by legacy key, and each stored fill matches at most one incoming fill,
+    so separate fills that share a time and price (e.g., one order matched
+    against several makers) are all kept.
+    
+    Args:
+        known_keys: trade_key of every stored fill to compare against
+        trades: Incoming trade records
+    
+    Returns:
+        List of the trades that are not stored yet (in their original order)
+    """
+    known_ids = set()
+    legacy_counts = Counter()
+    for key in known_keys:
+        if isinstance(key, str):
+            known_ids.add(key)
+        else:
+            legacy_counts[tuple(key)] += 1
+    
+    new_trades = []
+    for trade in trades:
+        trade_id = fill_id(trade)
+        if trade_id and trade_id in known_ids:
+            continue
+        legacy_key = legacy_trade_key(trade)
+        if legacy_counts[legacy_key] > 0:
+            legacy_counts[legacy_key] -= 1
+            continue
+        if trade_id:
+            known_ids.add(trade_id)
+        new_trades.append(trade)
+    return new_trades
+
+
+def to_trade_record(item):
+    """Convert a fill returned by the API into a trade history record"""
+    return {
+        "trade_time": item.get("trade_time"), # ISO 8601 format
+        "trade_type": item.get("trade_type"), # "FILL"
+        "price": item.get("price"),           # Price per unit
+        "size": item.get("size"),             # Quantity traded 
+        "product_id": item.get("product_id"), # e.g., "BTC-USD"
+        "commission": item.get("commission"), # Commission fee
+        "side": item.get("side"),             # "BUY" or "SELL"
+        "trade_id": item.get("trade_id"),     # Trade (match) identifier
+        "entry_id": item.get("entry_id"),     # Unique identifier of this fill
+    }
+
+
+def load_sync_state():
+    """Load saved pagination state, or an empty dict if there is none"""
+    if not os.path.exists(SYNC_STATE_FILE):
+        return {}
+    try:
+        with open(SYNC_STATE_FILE, "r") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"⚠️  Could not read sync state, ignoring it: {e}")
+        return {}
+
+
+def save_sync_state(state):
+    """Save pagination state so an interrupted sync can resume"""
+    write_json_atomic(SYNC_STATE_FILE, state)
+
+
+def iter_fill_pages(querystring, cursor=None):
+    """Fetch fills page by page, following the cursor until the last page
+    
+    Args:
+        querystring: Query parameters for the fills endpoint
+        cursor: Cursor to start from (optional, starts at the first page if not provided)
+    
+    Yields:
+        tuple: (list of fills on the page, cursor for the next page or None)
+    """
+    while True:
+        params = dict(querystring)
+        if cursor:
+            params["cursor"] = cursor
+        response = api_get("/api/v3/brokerage/orders/historical/fills", params=params)
+        if response.status_code != 200:
+            raise Exception(f"Fills request failed with HTTP {response.status_code}: {response.text[:200]}")
+        response = response.json()
+
+        fills = response.get("fills", [])
+        next_cursor = response.get("cursor") or None
+        if response.get("has_next") is False or not fills:
+            next_cursor = None
+        yield fills, next_cursor
+
+        if next_cursor is None:
+            break
+        cursor = next_cursor
+
+
+def fetch_alltime_fills(resume=True):
+    """Fetch the full fill history, streaming each page to disk as it arrives
+    
+    Pages are appended to PARTIAL_FILE and the next cursor is saved after
+    every page, so an interrupted sync continues where it stopped.
+    
+    Args:
+        resume: If True, continue an unfinished sync instead of starting over
+    
+    Returns:
+        List of trade records (deduplicated, sorted by trade_time)
+    """
+    os.makedirs(TRADE_HISTORY_DIR, exist_ok=True)
+    querystring = {"limit": str(PAGE_LIMIT)}
+    state = load_sync_state()
+    cursor = None
+
+    if resume and state.get("in_progress") and os.path.exists(PARTIAL_FILE):
+        cursor = state.get("cursor")
+        print(f"🔁 Resuming fills sync after {state.get('fills', 0)} fills ({state.get('pages', 0)} pages)")
+    else:
+        open(PARTIAL_FILE, "w").close()
+        state = {"in_progress": True, "cursor": None, "oldest_trade_time": None, "pages": 0, "fills": 0}
+        save_sync_state(state)
+
+    def stream_pages(pages):
+        for fills, next_cursor in pages:
+            with open(PARTIAL_FILE, "a") as f:
+                for item in fills:
+                    record = to_trade_record(item)
+                    f.write(dumps_compact(record) + "\n")
+                    if state["oldest_trade_time"] is None or record["trade_time"] < state["oldest_trade_time"]:
+                        state["oldest_trade_time"] = record["trade_time"]
+                f.flush()
+                os.fsync(f.fileno())
+            state["cursor"] = next_cursor
+            state["pages"] += 1
+            state["fills"] += len(fills)
+            save_sync_state(state)
+            print(f"  Page {state['pages']}: {len(fills)} fills ({state['fills']} total)")
+
+    try:
+        if state["pages"] > 0 and cursor is None:
+            print("  All pages already fetched, finishing previous sync")
+        else:
+            stream_pages(iter_fill_pages(querystring, cursor))
+    except Exception as e:
+        if not cursor or not state.get("oldest_trade_time"):
+            raise
+        # The saved cursor may have expired; fills come newest first, so
+        # continue from the oldest fill already saved instead
+        print(f"⚠️  Could not resume from saved cursor ({e}), resuming from {state['oldest_trade_time']}")
+        querystring["end_sequence_timestamp"] = state["oldest_trade_time"]
+        stream_pages(iter_fill_pages(querystring))
+
+    # Only fills fetched twice (resume overlap) share an id; nothing else is dropped
+    trades = filter_new_trades((), iter_json_records(PARTIAL_FILE))
+    return sorted(trades, key=lambda x: x["trade_time"])
+
+
+def update_high_water_mark(state, trades):
+    """Advance the high-water mark to the latest trade_time in `trades`
+    
+    The keys of every trade at the mark are kept as well, because the next
+    incremental request starts at (and includes) that timestamp.
+    """
+    if not trades:
+        return
+    latest = max(t["trade_time"] for t in trades)
+    high_water_mark = state.get("high_water_mark")
+    if high_water_mark and latest < high_water_mark:
+        return
+    boundary_keys = [trade_key(t) for t in trades if t["trade_time"] == latest]
+    if latest == high_water_mark:
+        boundary_keys += [k for k in state.get("boundary_keys", []) if k not in boundary_keys]
+    state["high_water_mark"] = latest
+    state["boundary_keys"] = boundary_keys
+
+
+def resolve_pending_append(state, file_path):
+    """Apply or drop the high-water mark of an incremental append
+    
+    The fast path saves the mark it is about to reach as "pending_append",
+    together with the file size before the append. If the file grew, the
+    append completed and the mark is applied; otherwise it never happened
+    (or was rolled back by recover_json_records) and the mark is dropped.
+    Either way, a crash between the append and the state update can no
+    longer append the same fills twice.
+    
+    Returns:
+        bool: True if a pending append was resolved
+    """
+    pending = state.pop("pending_append", None)
+    if pending is None:
+        return False
+    if os.path.exists(file_path) and os.path.getsize(file_path) > pending["size"]:
+        state["high_water_mark"] = pending["high_water_mark"]
+        state["boundary_keys"] = pending["boundary_keys"]
+    save_sync_state(state)
+    return True
+
+
+def finish_alltime_sync(trade_history):
+    """Remove the partial file, mark the sync as complete and record the high-water mark"""
+    if os.path.exists(PARTIAL_FILE):
+        os.remove(PARTIAL_FILE)
+    state = load_sync_state()
+    state.update({"in_progress": False, "cursor": None, "high_water_mark": None, "boundary_keys": []})
+    update_high_water_mark(state, trade_history)
+    save_sync_state(state)
+
+
+def fetch_fills_since(high_water_mark, boundary_keys=()):
+    """Fetch only the fills at or after the high-water mark that are not stored yet
+    
+    Returns:
+        List of new trade records sorted by trade_time
+    """
+    querystring = {"limit": str(PAGE_LIMIT), "start_sequence_timestamp": high_water_mark}
+    fetched = []
+    for fills, _ in iter_fill_pages(querystring):
+        for item in fills:
+            trade = to_trade_record(item)
+            if trade["trade_time"] >= high_water_mark:
+                fetched.append(trade)
+    return sorted(filter_new_trades(boundary_keys, fetched), key=lambda x: x["trade_time"])
+
+
+def get_filled_history(start_date, end_date=None, incremental=False, resume=True):
     """Get filled trade history from Coinbase API
     
     Args:
         start_date: Start date string or "alltime"
         end_date: End date string
         incremental: If True, merge with existing data instead of overwriting
+        resume: If True, continue an interrupted alltime sync from its saved cursor
+    
+    Returns:
+        List of trade records fetched from the API
     """
     # alltime condition
     isAllTime=False
@@ -20,69 +276,57 @@ def get_filled_history(start_date, end_date=None, incremental=False):
         isAllTime=True
         start_date="2020-01-01"
         end_date="3020-01-01"
-    request_method = "GET"
-    request_host   = "api.coinbase.com"
-    request_path   = "/api/v3/brokerage/orders/historical/fills"
-    uri = f"{request_method} {request_host}{request_path}"
-    jwt_token = build_jwt(uri)
-    # print(jwt_token)
-    headers = {
-        "Authorization": f"Bearer {jwt_token}",
-        "Content-Type": "application/json",
-    }
-    url=f"https://{request_host}{request_path}"
 
     start_dt = datetime.fromisoformat(start_date).replace(tzinfo=timezone.utc)
     end_dt = datetime.fromisoformat(end_date).replace(tzinfo=timezone.utc)
 
     start_iso = start_dt.isoformat(timespec='microseconds').replace('+00:00', 'Z')
     end_iso = end_dt.isoformat(timespec='microseconds').replace('+00:00', 'Z')
-    querystring = {"sort_by":"TRADE_TIME","start_sequence_timestamp":start_iso,"end_sequence_timestamp":end_iso}
-    if isAllTime:
-        querystring = {"limit":"2000"}
-    response = requests.get(url, headers=headers,params=querystring)
-    response=response.json()
-    
-    new_trades=[]
-    for item in response.get("fills", []):
-        new_trades.append({
-            "trade_time": item.get("trade_time"), # ISO 8601 format
-            "trade_type": item.get("trade_type"), # "FILL"
-            "price": item.get("price"),           # Price per unit
-            "size": item.get("size"),             # Quantity traded 
-            "product_id": item.get("product_id"), # e.g., "BTC-USD"
-            "commission": item.get("commission"), # Commission fee
-            "side": item.get("side"),             # "BUY" or "SELL"
-        })
     
     # Create directory if it doesn't exist
-    os.makedirs("./trade_history", exist_ok=True)
+    os.makedirs(TRADE_HISTORY_DIR, exist_ok=True)
     
     start_date_str = start_dt.strftime("%Y%m%d")
     end_date_str = end_dt.strftime("%Y%m%d")
     
     if isAllTime:
-        file_path = f"./trade_history/filled_alltime.json"
+        file_path = f"{TRADE_HISTORY_DIR}/filled_alltime.json"
+        state = load_sync_state()
+        if os.path.exists(file_path) and recover_json_records(file_path):
+            print(f"⚠️  Rolled back an interrupted append to {file_path}")
+        resolve_pending_append(state, file_path)
+        
+        # Fast path: only request fills after the high-water mark and append them
+        if incremental and os.path.exists(file_path) and state.get("high_water_mark") and not state.get("in_progress"):
+            since = state["high_water_mark"]
+            new_trades = fetch_fills_since(since, state.get("boundary_keys", []))
+            columns_current = not is_stale(load_trade_columns())
+            if new_trades:
+                # Record the mark this append reaches before touching the file
+                target = {"high_water_mark": since, "boundary_keys": state.get("boundary_keys", [])}
+                update_high_water_mark(target, new_trades)
+                state["pending_append"] = {"size": os.path.getsize(file_path), **target}
+                save_sync_state(state)
+                append_json_records(file_path, new_trades)
+                resolve_pending_append(state, file_path)
+            if columns_current:
+                append_trade_columns(new_trades)
+            else:
+                build_trade_columns(load_json_records(file_path))
+            print(f"📊 Incremental update: {len(new_trades)} new trades since {since}")
+            return new_trades
+        
+        new_trades = fetch_alltime_fills(resume=resume)
         
         # If incremental mode and file exists, merge with existing data
         if incremental and os.path.exists(file_path):
             try:
-                with open(file_path, "r") as f:
-                    existing_trades = json.load(f)
-                
-                # Create a set of existing trade identifiers (time + product_id + side + price)
-                existing_ids = {
-                    (t["trade_time"], t["product_id"], t["side"], t["price"])
-                    for t in existing_trades
-                }
+                existing_trades = load_json_records(file_path)
                 
-                # Add only new trades that don't exist
-                trades_added = 0
-                for trade in new_trades:
-                    trade_id = (trade["trade_time"], trade["product_id"], trade["side"], trade["price"])
-                    if trade_id not in existing_ids:
-                        existing_trades.append(trade)
-                        trades_added += 1
+                # Add only new trades that don't exist (matched by fill id, see filter_new_trades)
+                added_trades = filter_new_trades((trade_key(t) for t in existing_trades), new_trades)
+                existing_trades.extend(added_trades)
+                trades_added = len(added_trades)
                 
                 # Sort by trade_time to maintain chronological order
                 existing_trades.sort(key=lambda x: x["trade_time"])
@@ -98,13 +342,17 @@ def get_filled_history(start_date, end_date=None, incremental=False):
             if incremental:
                 print(f"📊 First time fetch: {len(trade_history)} trades")
         
-        with open(file_path, "w") as f:
-            json.dump(trade_history, f, indent=4)
+        write_json_records_atomic(file_path, trade_history)
+        build_trade_columns(trade_history)
+        finish_alltime_sync(trade_history)
     else:
-        with open(f"./trade_history/filled_{start_date_str}_{end_date_str}.json", "w") as f:
-            json.dump(new_trades, f, indent=4)
+        querystring = {"sort_by":"TRADE_TIME","start_sequence_timestamp":start_iso,"end_sequence_timestamp":end_iso}
+        new_trades = []
+        for fills, _ in iter_fill_pages(querystring):
+            new_trades.extend(to_trade_record(item) for item in fills)
+        write_json_records_atomic(f"{TRADE_HISTORY_DIR}/filled_{start_date_str}_{end_date_str}.json", new_trades)
             
-    return response
+    return new_trades
 
 if __name__ == "__main__":
     # Example usage
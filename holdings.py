@@ -0,0 +1,96 @@
+"""
+Holdings snapshot: account balances fetched once per run
+
+Every report and backfill in a run values positions with the same snapshot,
+and the snapshot can be saved to disk so later reruns do not need the
+accounts API at all.
+"""
+
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+from coinbase_client import api_get
+from utils import write_json_atomic
+
+HOLDINGS_DIR = "./holdings"
+HOLDINGS_FILE = f"{HOLDINGS_DIR}/holdings_latest.json"
+ACCOUNTS_PAGE_LIMIT = 250
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def fetch_holdings():
+    """Fetch all account balances, following the accounts cursor to the last page
+
+    Returns:
+        dict: Snapshot with "fetched_at" (ISO 8601) and "hold", mapping
+        currency to {"ticker": currency, "hold": balance} for non-zero balances
+    """
+    hold_result = {}
+    fetched_at = datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+    cursor = None
+    while True:
+        params = {"limit": ACCOUNTS_PAGE_LIMIT}
+        if cursor:
+            params["cursor"] = cursor
+        response = api_get("/api/v3/brokerage/accounts", params=params)
+        if response.status_code != 200:
+            raise Exception(f"Accounts request failed with HTTP {response.status_code}: {response.text[:200]}")
+        response = response.json()
+
+        for account in response.get("accounts", []):
+            balance = float(account.get("available_balance", {}).get("value", 0)) + float(account.get("hold", {}).get("value", 0))
+            if balance > 0:
+                currency = account.get("currency")
+                previous = hold_result.get(currency, {}).get("hold", 0)
+                hold_result[currency] = {
+                    "ticker": currency,
+                    "hold": round(previous + balance, 8),
+                }
+
+        cursor = response.get("cursor") or None
+        if not response.get("has_next") or cursor is None:
+            break
+
+    return {"fetched_at": fetched_at, "hold": hold_result}
+
+
+def save_holdings_snapshot(snapshot, file_path=HOLDINGS_FILE):
+    """Save a holdings snapshot to disk"""
+    write_json_atomic(file_path, snapshot)
+
+
+def load_holdings_snapshot(file_path=HOLDINGS_FILE):
+    """Load a saved holdings snapshot, or None if there is none"""
+    if not os.path.exists(file_path):
+        return None
+    with open(file_path, "r") as f:
+        return json.load(f)
+
+
+def get_holdings_snapshot(use_saved=False, refresh=False):
+    """Get this run's holdings snapshot, fetching it on first use
+
+    The fetched snapshot is saved to HOLDINGS_FILE.
+
+    Args:
+        use_saved: If True, use the snapshot saved on disk instead of calling
+            the accounts API (falls back to fetching if none was saved)
+        refresh: If True, discard this run's snapshot and fetch a new one
+
+    Returns:
+        dict: Snapshot with "fetched_at" and "hold" (see fetch_holdings)
+    """
+    global _snapshot
+    with _snapshot_lock:
+        if _snapshot is not None and not refresh:
+            return _snapshot
+        snapshot = load_holdings_snapshot() if use_saved and not refresh else None
+        if snapshot is None:
+            snapshot = fetch_holdings()
+            save_holdings_snapshot(snapshot)
+        _snapshot = snapshot
+        return _snapshot
@@ -0,0 +1,198 @@
+"""
+Persistent local cache for Coinbase candle prices
+
+Finalized candles never change, so once a candle has been fetched it is
+stored in a small SQLite database keyed by (product_id, granularity, start)
+and served locally on every later lookup.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_PATH = "./price_cache/candles.sqlite3"
+
+GRANULARITY_SECONDS = {
+    "ONE_MINUTE": 60,
+    "FIVE_MINUTE": 300,
+    "FIFTEEN_MINUTE": 900,
+    "THIRTY_MINUTE": 1800,
+    "ONE_HOUR": 3600,
+    "TWO_HOUR": 7200,
+    "SIX_HOUR": 21600,
+    "ONE_DAY": 86400,
+}
+
+# Coinbase may publish a candle a few seconds after its bucket closes,
+# so only treat a missing candle as "no trades" after this extra delay
+FINALIZE_DELAY_SECONDS = 60
+
+# Returned by get_cached_open when the candle has never been fetched
+CACHE_MISS = object()
+
+_lock = threading.Lock()
+_connection = None
+# In-process copy of every candle looked up or stored during this run
+_memory = {}
+_stats = {"hits": 0, "misses": 0, "stored": 0}
+
+
+def _get_connection():
+    """Open the cache database on first use"""
+    global _connection
+    if _connection is None:
+        os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+        _connection = sqlite3.connect(CACHE_PATH, check_same_thread=False)
+        _connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS candles (
+                product_id TEXT NOT NULL,
+                granularity TEXT NOT NULL,
+                start INTEGER NOT NULL,
+                open REAL,
+                high REAL,
+                low REAL,
+                close REAL,
+                volume REAL,
+                PRIMARY KEY (product_id, granularity, start)
+            ) WITHOUT ROWID
+            """
+        )
+        _connection.commit()
+    return _connection
+
+
+def is_finalized(granularity, start, now=None):
+    """Check whether the candle starting at `start` can no longer change
+
+    Args:
+        granularity: Candle granularity, e.g., "ONE_MINUTE"
+        start: Candle start as epoch seconds
+        now: Current epoch seconds (optional, defaults to time.time())
+    """
+    if now is None:
+        now = time.time()
+    return start + GRANULARITY_SECONDS[granularity] + FINALIZE_DELAY_SECONDS <= now
+
+
+def get_cached_open(product_id, granularity, start, count=True):
+    """Get the cached open price of a candle
+
+    Args:
+        count: If False, leave the hit/miss counters alone (for lookups that
+            probe several candles and report one result with count_lookup)
+
+    Returns:
+        The open price, None if the candle is known to be empty (no trades),
+        or CACHE_MISS if the candle has never been fetched
+    """
+    key = (product_id, granularity, int(start))
+    with _lock:
+        if key in _memory:
+            price = _memory[key]
+        else:
+            row = _get_connection().execute(
+                "SELECT open FROM candles WHERE product_id = ? AND granularity = ? AND start = ?",
+                key,
+            ).fetchone()
+            if row is None:
+                price = CACHE_MISS
+            else:
+                price = row[0]
+                _memory[key] = price
+        if count:
+            _stats["misses" if price is CACHE_MISS else "hits"] += 1
+        return price
+
+
+def count_lookup(hit):
+    """Count one lookup answered locally (hit=True) or sent to the API (hit=False)"""
+    with _lock:
+        _stats["hits" if hit else "misses"] += 1
+
+
+def count_cached(product_id, granularity, start, end):
+    """Count cached candles (including known-empty ones) with start in [start, end]"""
+    with _lock:
+        row = _get_connection().execute(
+            "SELECT COUNT(*) FROM candles WHERE product_id = ? AND granularity = ? AND start BETWEEN ? AND ?",
+            (product_id, granularity, int(start), int(end)),
+        ).fetchone()
+        return row[0]
+
+
+def store_candles(product_id, granularity, candles, empty_starts=(), now=None):
+    """Store finalized candles returned by the candles API
+
+    Args:
+        product_id: Trading pair, e.g., "BTC-USDC"
+        granularity: Candle granularity, e.g., "ONE_MINUTE"
+        candles: Candle dicts as returned by the API ("start", "open", ...)
+        empty_starts: Candle starts that were requested but had no trades
+        now: Current epoch seconds (optional, defaults to time.time())
+
+    Returns:
+        int: Number of rows written
+    """
+    if now is None:
+        now = time.time()
+
+    rows = []
+    for candle in candles:
+        start = int(candle["start"])
+        if not is_finalized(granularity, start, now):
+            continue
+        rows.append((
+            product_id,
+            granularity,
+            start,
+            float(candle["open"]),
+            float(candle["high"]),
+            float(candle["low"]),
+            float(candle["close"]),
+            float(candle["volume"]),
+        ))
+    for start in empty_starts:
+        if is_finalized(granularity, start, now):
+            rows.append((product_id, granularity, int(start), None, None, None, None, None))
+
+    if not rows:
+        return 0
+
+    with _lock:
+        connection = _get_connection()
+        connection.executemany(
+            "INSERT OR REPLACE INTO candles VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        connection.commit()
+        for row in rows:
+            _memory[row[:3]] = row[3]
+        _stats["stored"] += len(rows)
+    return len(rows)
+
+
+def get_cache_stats():
+    """Get hit/miss counters for this process
+
+    Returns:
+        dict: Dictionary containing hits, misses and stored
+    """
+    with _lock:
+        return dict(_stats)
+
+
+def reset_cache_stats():
+    """Reset hit/miss counters"""
+    with _lock:
+        for key in _stats:
+            _stats[key] = 0
+
+
+def print_cache_stats():
+    """Print a one-line summary of cache usage"""
+    stats = get_cache_stats()
+    lookups = stats["hits"] + stats["misses"]
+    hit_rate = stats["hits"] / lookups * 100 if lookups > 0 else 0
+    print(f"💾 Price cache: {stats['hits']} hits, {stats['misses']} misses ({hit_rate:.1f}% hit rate), {stats['stored']} candles stored")
@@ -0,0 +1,126 @@
+"""
+Shared price lookups with one fallback chain for every calculator
+
+Historical prices come from candles, then from the trade history, then from
+the live price snapshot. Every (ticker, timestamp) answer is memoized for the
+run, and the level of the chain that answered is recorded next to it.
+"""
+
+import threading
+from collections import Counter
+
+from price_snapshot import get_current_price
+
+# Where a resolved price came from, in fallback order
+SOURCE_CANDLE = "candle"            # One-minute candle at the timestamp
+SOURCE_FIRST_TRADE = "first_trade"  # First trade of the ticker
+SOURCE_LAST_TRADE = "last_trade"    # Last trade of the ticker at or before the timestamp
+SOURCE_LIVE = "live"                # This run's price snapshot
+SOURCE_NONE = "none"                # No source had a price
+
+
+class PriceResolver:
+    """Resolve prices for one trade history, memoizing every lookup"""
+
+    def __init__(self, trade_book, historical_price):
+        """
+        Args:
+            trade_book: TradeBook of all trades (for trade-price fallbacks)
+            historical_price: Function (ticker, timestamp_str) -> price or None,
+                e.g., get_historical_price_from_candles
+        """
+        self._trade_book = trade_book
+        self._historical_price = historical_price
+        self._lock = threading.Lock()
+        self._prices = {}
+        self._sources = {}
+        self.first_trade_prices = {ticker: trade_book.first_trade_price(ticker) for ticker in trade_book.product_ids}
+        self.last_trade_prices = {ticker: trade_book.last_trade_price(ticker) for ticker in trade_book.product_ids}
+
+    def _trade_price(self, ticker, timestamp, fallback):
+        if fallback == SOURCE_FIRST_TRADE:
+            return self.first_trade_prices.get(ticker)
+        if timestamp is None:
+            return self.last_trade_prices.get(ticker)
+        return self._trade_book.up_to(timestamp).last_trade_price(ticker)
+
+    def _remember(self, key, price, source):
+        with self._lock:
+            self._prices[key] = price
+            self._sources[key] = source
+        return price
+
+    def price_at(self, ticker, timestamp, fallback=SOURCE_LAST_TRADE):
+        """Get the price of a ticker at a time
+
+        Tries the candle at `timestamp`, then a trade price (the first trade,
+        or the last trade at or before `timestamp`), then the live price.
+
+        Args:
+            ticker: Trading pair, e.g., "BTC-USDC"
+            timestamp: ISO 8601 timestamp, e.g., "2025-10-22T00:34:38.959435Z"
+            fallback: SOURCE_LAST_TRADE (default) or SOURCE_FIRST_TRADE
+
+        Returns:
+            float: Price, or None if no source had one
+        """
+        key = (ticker, timestamp, fallback)
+        with self._lock:
+            if key in self._prices:
+                return self._prices[key]
+
+        price = self._historical_price(ticker, timestamp)
+        if price:
+            return self._remember(key, price, SOURCE_CANDLE)
+        price = self._trade_price(ticker, timestamp, fallback)
+        if price:
+            return self._remember(key, price, fallback)
+        price = get_current_price(ticker)
+        if price:
+            return self._remember(key, price, SOURCE_LIVE)
+        return self._remember(key, None, SOURCE_NONE)
+
+    def current_price(self, ticker):
+        """Get the current price of a ticker: the live snapshot, then the last trade
+
+        Returns:
+            float: Price, or None if no source had one
+        """
+        key = (ticker, None, SOURCE_LIVE)
+        with self._lock:
+            if key in self._prices:
+                return self._prices[key]
+
+        price = get_current_price(ticker)
+        if price:
+            return self._remember(key, price, SOURCE_LIVE)
+        price = self.last_trade_prices.get(ticker)
+        if price:
+            return self._remember(key, price, SOURCE_LAST_TRADE)
+        return self._remember(key, None, SOURCE_NONE)
+
+    def get_source(self, ticker, timestamp=None, fallback=SOURCE_LAST_TRADE):
+        """Which source answered a lookup (None if it was never resolved)
+
+        Use timestamp=None for current_price lookups.
+        """
+        key = (ticker, None, SOURCE_LIVE) if timestamp is None else (ticker, timestamp, fallback)
+        with self._lock:
+            return self._sources.get(key)
+
+    def get_source_counts(self):
+        """Count resolved lookups by source
+
+        Returns:
+            dict: Mapping source to number of lookups
+        """
+        with self._lock:
+            return dict(Counter(self._sources.values()))
+
+    def print_source_counts(self):
+        """Print a one-line summary of where prices came from"""
+        counts = self.get_source_counts()
+        summary = ", ".join(f"{counts[source]} {source}" for source in
+                            (SOURCE_CANDLE, SOURCE_LIVE, SOURCE_FIRST_TRADE, SOURCE_LAST_TRADE, SOURCE_NONE)
+                            if counts.get(source))
+        print(f"🏷️  Price sources: {summary or 'no lookups'}")
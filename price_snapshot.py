@@ -0,0 +1,75 @@
+"""
+Current-price snapshot: one batched quote fetch shared by a whole run
+
+Prices for many products come back from a single request to the product list
+endpoint, and every report in the run values positions with the same "now"
+prices instead of looking each ticker up again.
+"""
+
+import threading
+from datetime import datetime, timezone
+
+from coinbase_client import api_get
+
+# Product ids per request to the product list endpoint
+PRODUCTS_BATCH_SIZE = 100
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def fetch_current_prices(tickers):
+    """Fetch current prices for many products with the product list endpoint
+
+    Args:
+        tickers: Trading pairs, e.g., ["BTC-USDC", "ETH-USDC"]
+
+    Returns:
+        dict: Mapping ticker to price (None if the product returned no price)
+    """
+    tickers = list(dict.fromkeys(tickers))
+    prices = {}
+    for idx in range(0, len(tickers), PRODUCTS_BATCH_SIZE):
+        batch = tickers[idx:idx + PRODUCTS_BATCH_SIZE]
+        params = {"product_ids": batch, "limit": len(batch)}
+        response = api_get("/api/v3/brokerage/products", params=params)
+        if response.status_code != 200:
+            raise Exception(f"Products request failed with HTTP {response.status_code}: {response.text[:200]}")
+        for product in response.json().get("products", []):
+            price = float(product.get("price") or 0)
+            prices[product.get("product_id")] = price if price > 0 else None
+        for ticker in batch:
+            prices.setdefault(ticker, None)
+    return prices
+
+
+def get_price_snapshot(tickers=(), refresh=False):
+    """Get this run's price snapshot, fetching any tickers it does not have yet
+
+    Pass every ticker a run needs in the first call so they are all quoted
+    at the same moment.
+
+    Args:
+        tickers: Trading pairs the caller needs, e.g., ["BTC-USDC", "ETH-USDC"]
+        refresh: If True, discard this run's snapshot and start a new one
+
+    Returns:
+        dict: Snapshot with "fetched_at" (ISO 8601) and "prices" (ticker to price or None)
+    """
+    global _snapshot
+    with _snapshot_lock:
+        if _snapshot is None or refresh:
+            _snapshot = {
+                "fetched_at": datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z'),
+                "prices": {},
+            }
+        missing = [ticker for ticker in tickers if ticker not in _snapshot["prices"]]
+        if missing:
+            _snapshot["prices"].update(fetch_current_prices(missing))
+        return _snapshot
+
+
+def get_current_price(ticker):
+    """Get a ticker's price from this run's snapshot (None if unavailable)"""
+    return get_price_snapshot([ticker])["prices"].get(ticker)
+
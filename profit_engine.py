@@ -0,0 +1,142 @@
+"""
+Vectorized profit calculation over the columnar trade store
+
+Computes the same numbers as extract_ticker_trades + calculate_profit_components
+for every ticker at once, using grouped reductions over the fill arrays.
+"""
+
+import numpy as np
+
+from trade_store import SIDE_CODES
+
+
+def compute_ticker_totals(columns):
+    """Sum buys, sells and sizes per product with one bincount per field
+
+    Fills are added sequentially in trade_time order. The per-ticker loop uses
+    sum(), which rounds differently on Python 3.12+, so the two paths agree to
+    floating-point rounding (well below a cent), not bit for bit.
+
+    Args:
+        columns: Column arrays as returned by trade_store.load_trade_columns
+
+    Returns:
+        dict: Mapping product_id to total_buys, total_sells, total_buy_size,
+        total_sell_size and first_buy_time_us
+    """
+    products = columns["products"]
+    num_products = len(products)
+    product_idx = np.asarray(columns["product_idx"])
+    side = np.asarray(columns["side"])
+    price = np.asarray(columns["price"])
+    size = np.asarray(columns["size"])
+    commission = np.asarray(columns["commission"])
+
+    is_buy = side == SIDE_CODES["BUY"]
+    is_sell = side == SIDE_CODES["SELL"]
+    notional = price * size
+
+    buy_idx = product_idx[is_buy]
+    sell_idx = product_idx[is_sell]
+    total_buys = np.bincount(buy_idx, weights=(notional + commission)[is_buy], minlength=num_products)
+    total_sells = np.bincount(sell_idx, weights=(notional - commission)[is_sell], minlength=num_products)
+    total_buy_size = np.bincount(buy_idx, weights=size[is_buy], minlength=num_products)
+    total_sell_size = np.bincount(sell_idx, weights=size[is_sell], minlength=num_products)
+
+    # Fills are sorted by time, so the first occurrence is the first buy
+    first_buy_time_us = np.full(num_products, -1, dtype=np.int64)
+    buy_products, first_rows = np.unique(buy_idx, return_index=True)
+    first_buy_time_us[buy_products] = np.asarray(columns["trade_time_us"])[is_buy][first_rows]
+
+    totals = {}
+    for idx, product_id in enumerate(products):
+        totals[product_id] = {
+            "total_buys": float(total_buys[idx]),
+            "total_sells": float(total_sells[idx]),
+            "total_buy_size": float(total_buy_size[idx]),
+            "total_sell_size": float(total_sell_size[idx]),
+            "first_buy_time_us": int(first_buy_time_us[idx]) if first_buy_time_us[idx] >= 0 else None,
+        }
+    return totals
+
+
+def calculate_all_profit_components(totals, tickers, holds, prices):
+    """Calculate realized and unrealized profit for many tickers at once
+
+    Args:
+        totals: Per-product totals from compute_ticker_totals
+        tickers: Tickers to calculate, e.g., ["BTC-USDC", "ETH-USDC"]
+        holds: Mapping ticker to current holding amount
+        prices: Mapping ticker to current price (None or missing means unknown)
+
+    Returns:
+        dict: Mapping ticker to avg_buy_price, realized_profit,
+        unrealized_profit and total_profit (see calculate_profit_components)
+    """
+    empty = {"total_buys": 0.0, "total_sells": 0.0, "total_buy_size": 0.0, "total_sell_size": 0.0}
+    rows = [totals.get(ticker, empty) for ticker in tickers]
+
+    total_buys = np.array([row["total_buys"] for row in rows], dtype=np.float64)
+    total_sells = np.array([row["total_sells"] for row in rows], dtype=np.float64)
+    total_buy_size = np.array([row["total_buy_size"] for row in rows], dtype=np.float64)
+    total_sell_size = np.array([row["total_sell_size"] for row in rows], dtype=np.float64)
+    hold = np.array([holds.get(ticker, 0) for ticker in tickers], dtype=np.float64)
+    has_price = np.array([prices.get(ticker) is not None for ticker in tickers])
+    price = np.array([prices.get(ticker) or 0 for ticker in tickers], dtype=np.float64)
+
+    has_buys = total_buy_size > 0
+    avg_buy_price = np.divide(total_buys, total_buy_size, out=np.zeros_like(total_buys), where=has_buys)
+
+    realized_profit = np.where(
+        (total_sell_size > 0) & has_buys,
+        total_sells - avg_buy_price * total_sell_size,
+        0.0,
+    )
+    unrealized_profit = np.where(
+        (hold > 0) & has_price & has_buys,
+        hold * price - avg_buy_price * hold,
+        0.0,
+    )
+    total_profit = realized_profit + unrealized_profit
+
+    return {
+        ticker: {
+            "avg_buy_price": float(avg_buy_price[idx]),
+            "realized_profit": float(realized_profit[idx]),
+            "unrealized_profit": float(unrealized_profit[idx]),
+            "total_profit": float(total_profit[idx]),
+        }
+        for idx, ticker in enumerate(tickers)
+    }
+
+
+def calculate_all_profits(columns, tickers, holds, prices):
+    """Calculate the calculate_profit result for many tickers at once
+
+    Args:
+        columns: Column arrays as returned by trade_store.load_trade_columns
+        tickers: Tickers to calculate, e.g., ["BTC-USDC", "ETH-USDC"]
+        holds: Mapping ticker to current holding amount
+        prices: Mapping ticker to current price
+
+    Returns:
+        List of dicts with the same fields as calculate_profit
+    """
+    totals = compute_ticker_totals(columns)
+    components = calculate_all_profit_components(totals, tickers, holds, prices)
+    empty = {"total_buys": 0.0, "total_sells": 0.0}
+
+    results = []
+    for ticker in tickers:
+        ticker_totals = totals.get(ticker, empty)
+        profit_components = components[ticker]
+        results.append({
+            "ticker": ticker,
+            "total_buys": round(float(ticker_totals["total_buys"]), 8),
+            "total_sells": round(float(ticker_totals["total_sells"]), 8),
+            "hold_amount": round(float(holds.get(ticker, 0)), 8),
+            "realized_profit": round(float(profit_components["realized_profit"]), 8),
+            "unrealized_profit": round(float(profit_components["unrealized_profit"]), 8),
+            "total_profit": round(float(profit_components["total_profit"]), 8),
+        })
+    return results
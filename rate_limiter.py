@@ -0,0 +1,47 @@
+"""
+Token-bucket rate limiter shared by every thread that calls the Coinbase API
+"""
+
+import threading
+import time
+
+
+class RateLimiter:
+    """Allow at most `rate` calls per second on average, with bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity=None):
+        """
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum number of tokens (defaults to rate)
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+# Coinbase Advanced Trade allows 30 requests per second per user on private
+# endpoints. Every endpoint we call (accounts, products, candles and fills) is
+# private and counts against that one budget, so they all share this bucket.
+API_RATE_LIMITER = RateLimiter(rate=30)
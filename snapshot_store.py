@@ -0,0 +1,514 @@
+"""
+Time-series store for the daily profit and comparison snapshots
+
+Every snapshot generate_daily_history produces lives in one SQLite database,
+with one row per (date, ticker), instead of one profit_begin_YYYYMMDD.json and
+one comparison_begin_YYYYMMDD.json per day. Saving a date replaces that
+date's rows, charts read any date range with a single query, and the old
+per-day JSON files can still be exported (or imported) for compatibility.
+
+Per-day JSON files left by earlier versions are imported automatically the
+first time the store is opened. Set EXPORT_DAILY_JSON=1 to keep writing the
+per-day files next to the store on every save.
+
+Usage:
+    python snapshot_store.py export [START_DATE [END_DATE]]
+    python snapshot_store.py import
+"""
+
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from utils import write_json_atomic
+
+STORE_PATH = "./profit_history/snapshots.sqlite3"
+PROFIT_DIR = "./profit_history"
+COMPARISON_DIR = "./comparison"
+
+# Also write profit_begin_YYYYMMDD.json / comparison_begin_YYYYMMDD.json whenever a date is saved
+EXPORT_DAILY_JSON = os.environ.get("EXPORT_DAILY_JSON", "0") == "1"
+# store_meta key recording that the per-day JSON files were imported
+LEGACY_IMPORT_KEY = "legacy_json_imported_at"
+
+# Fields of each per-ticker record, in the order they are written to JSON
+PROFIT_FIELDS = (
+    "ticker", "total_buys", "total_sells", "hold_amount", "price_at_date",
+    "realized_profit", "unrealized_profit", "total_profit",
+)
+ROI_FIELDS = (
+    "ticker", "start_time", "start_price", "current_price", "price_change_percent",
+    "total_buys", "total_sells", "net_investment", "hold_amount", "realized_profit",
+    "unrealized_profit", "total_profit", "trading_roi_percent", "performance_diff", "beat_hodl",
+)
+VS_BTC_FIELDS = (
+    "ticker", "start_time", "total_buys", "total_sells", "hold_amount",
+    "actual_profit", "btc_alternative_profit", "difference", "better_than_btc",
+)
+TEXT_FIELDS = {"ticker", "start_time"}
+BOOLEAN_FIELDS = {"beat_hodl", "better_than_btc"}
+# Fields that may legitimately be null; any other null field was missing from the record
+NULLABLE_FIELDS = {"start_time"}
+
+# Snapshot section -> (table, fields)
+TABLES = {
+    "profit": ("profit_snapshots", PROFIT_FIELDS),
+    "roi_comparison": ("roi_snapshots", ROI_FIELDS),
+    "vs_btc_comparison": ("vs_btc_snapshots", VS_BTC_FIELDS),
+}
+COMPARISON_SECTIONS = ("roi_comparison", "vs_btc_comparison")
+
+# Fields of each section that are pivoted into dates x tickers matrices
+NUMERIC_FIELDS = {
+    section: tuple(field for field in fields if field not in TEXT_FIELDS)
+    for section, (table, fields) in TABLES.items()
+}
+
+_lock = threading.Lock()
+_connection = None
+
+
+def _column_type(field):
+    if field in TEXT_FIELDS:
+        return "TEXT"
+    if field in BOOLEAN_FIELDS:
+        return "INTEGER"
+    return "REAL"
+
+
+def _get_connection():
+    """Open the store on first use"""
+    global _connection
+    if _connection is None:
+        os.makedirs(os.path.dirname(STORE_PATH), exist_ok=True)
+        connection = sqlite3.connect(STORE_PATH, check_same_thread=False)
+        for table, fields in TABLES.values():
+            columns = ",\n".join(f"{field} {_column_type(field)}" for field in fields)
+            connection.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    date TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    {columns},
+                    PRIMARY KEY (date, ticker)
+                ) WITHOUT ROWID
+                """
+            )
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS comparison_snapshots (
+                date TEXT PRIMARY KEY,
+                range TEXT,
+                end_date TEXT,
+                generated_at TEXT
+            ) WITHOUT ROWID
+            """
+        )
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS store_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            ) WITHOUT ROWID
+            """
+        )
+        connection.commit()
+        _import_legacy_once(connection)
+        _connection = connection
+    return _connection
+
+
+def _import_legacy_once(connection):
+    """Import the per-day JSON files of earlier versions the first time the store is opened
+
+    The import is recorded in store_meta, so it runs exactly once per store,
+    before anything is saved or read. Dates already in the store are kept.
+    """
+    if connection.execute("SELECT 1 FROM store_meta WHERE key = ?", (LEGACY_IMPORT_KEY,)).fetchone():
+        return
+    imported = _import_files(connection, PROFIT_DIR, COMPARISON_DIR, overwrite=False)
+    with connection:
+        connection.execute(
+            "INSERT OR REPLACE INTO store_meta VALUES (?, ?)",
+            (LEGACY_IMPORT_KEY, datetime.now().isoformat()),
+        )
+    if imported:
+        print(f"📦 Imported {imported} per-day JSON files into {STORE_PATH}")
+
+
+def to_date_key(date_str):
+    """Normalize "YYYY-MM-DD" or "YYYYMMDD" to the store's "YYYY-MM-DD" key"""
+    if len(date_str) == 8:
+        return f"{date_str[:4]}-{date_str[4:6]}-{date_str[6:]}"
+    return date_str
+
+
+def _to_row(date_key, position, record, fields):
+    row = [date_key, position]
+    for field in fields:
+        value = record.get(field)
+        row.append(int(value) if field in BOOLEAN_FIELDS and value is not None else value)
+    return row
+
+
+def _to_record(row, fields):
+    record = {}
+    for field, value in zip(fields, row):
+        if value is None and field not in NULLABLE_FIELDS:
+            continue
+        record[field] = bool(value) if field in BOOLEAN_FIELDS and value is not None else value
+    return record
+
+
+def _replace_rows(connection, section, date_key, records):
+    # A ticker listed twice for one date (per-day files of accounts that traded
+    # both X-USD and X-USDC) keeps its last record instead of failing the save
+    table, fields = TABLES[section]
+    connection.execute(f"DELETE FROM {table} WHERE date = ?", (date_key,))
+    placeholders = ", ".join("?" * (len(fields) + 2))
+    connection.executemany(
+        f"INSERT OR REPLACE INTO {table} VALUES ({placeholders})",
+        [_to_row(date_key, position, record, fields) for position, record in enumerate(records)],
+    )
+
+
+def save_snapshot(date_str, profit_results=None, comparison=None):
+    """Save (upsert) the snapshot of one date
+
+    The sections that are given replace that date's previous rows; sections
+    left as None keep what was stored before.
+
+    Args:
+        date_str: Date in format "YYYY-MM-DD" or "YYYYMMDD"
+        profit_results: List of per-ticker profit records (see calculate_profit_by_date)
+        comparison: Dictionary with "range", "end_date", "generated_at",
+            "roi_comparison" and "vs_btc_comparison" (optional)
+    """
+    date_key = to_date_key(date_str)
+    with _lock:
+        connection = _get_connection()
+        with connection:
+            if profit_results is not None:
+                _replace_rows(connection, "profit", date_key, profit_results)
+            if comparison is not None:
+                for section in COMPARISON_SECTIONS:
+                    _replace_rows(connection, section, date_key, comparison.get(section, []))
+                _replace_comparison_metadata(connection, date_key, comparison)
+    if EXPORT_DAILY_JSON:
+        export_json_files(date_key, date_key)
+
+
+def _replace_comparison_metadata(connection, date_key, comparison):
+    connection.execute(
+        "INSERT OR REPLACE INTO comparison_snapshots VALUES (?, ?, ?, ?)",
+        (date_key, comparison.get("range"), comparison.get("end_date"), comparison.get("generated_at")),
+    )
+
+
+def _load_section(connection, section, start_key, end_key):
+    """Load one section's records between two date keys, grouped by date key"""
+    table, fields = TABLES[section]
+    rows = connection.execute(
+        f"SELECT date, {', '.join(fields)} FROM {table} WHERE date BETWEEN ? AND ? ORDER BY date, position",
+        (start_key, end_key),
+    )
+    records = {}
+    for row in rows:
+        records.setdefault(row[0], []).append(_to_record(row[1:], fields))
+    return records
+
+
+def _date_range(start_date=None, end_date=None):
+    start_key = to_date_key(start_date) if start_date else "0000-00-00"
+    end_key = to_date_key(end_date) if end_date else "9999-99-99"
+    return start_key, end_key
+
+
+def load_profit_range(start_date=None, end_date=None):
+    """Load profit snapshots for a date range
+
+    Args:
+        start_date: First date, "YYYY-MM-DD" or "YYYYMMDD" (optional, defaults to the first stored date)
+        end_date: Last date, inclusive (optional, defaults to the last stored date)
+
+    Returns:
+        Dictionary mapping date (datetime) to the list of per-ticker profit records
+    """
+    start_key, end_key = _date_range(start_date, end_date)
+    with _lock:
+        records = _load_section(_get_connection(), "profit", start_key, end_key)
+    return {datetime.strptime(date_key, "%Y-%m-%d"): data for date_key, data in records.items()}
+
+
+def load_comparison_range(start_date=None, end_date=None):
+    """Load comparison snapshots for a date range
+
+    Args:
+        start_date: First date, "YYYY-MM-DD" or "YYYYMMDD" (optional, defaults to the first stored date)
+        end_date: Last date, inclusive (optional, defaults to the last stored date)
+
+    Returns:
+        Dictionary mapping date (datetime) to a dictionary with "range", "end_date",
+        "generated_at", "roi_comparison" and "vs_btc_comparison"
+    """
+    start_key, end_key = _date_range(start_date, end_date)
+    with _lock:
+        connection = _get_connection()
+        metadata = connection.execute(
+            "SELECT date, range, end_date, generated_at FROM comparison_snapshots WHERE date BETWEEN ? AND ? ORDER BY date",
+            (start_key, end_key),
+        ).fetchall()
+        sections = {section: _load_section(connection, section, start_key, end_key) for section in COMPARISON_SECTIONS}
+
+    comparison_data = {}
+    for date_key, range_name, end_date_str, generated_at in metadata:
+        comparison = {"range": range_name, "end_date": end_date_str, "generated_at": generated_at}
+        for section in COMPARISON_SECTIONS:
+            comparison[section] = sections[section].get(date_key, [])
+        comparison_data[datetime.strptime(date_key, "%Y-%m-%d")] = comparison
+    return comparison_data
+
+
+class SnapshotPivot:
+    """Dates x tickers matrices of every numeric field of one snapshot section
+
+    Built once from the stored rows, so every chart reads its series as
+    array columns instead of walking the records of each date again.
+    Cells of tickers that have no record on a date (and fields a record
+    does not have) are masked.
+    """
+
+    def __init__(self, dates, tickers, values, present):
+        """
+        Args:
+            dates: Sorted list of datetimes (rows)
+            tickers: Sorted list of tickers (columns)
+            values: Dictionary mapping field to a float array of shape (dates, tickers), NaN where missing
+            present: Boolean array of shape (dates, tickers), True where the ticker has a record
+        """
+        self.dates = dates
+        self.tickers = tickers
+        self.present = present
+        self._columns = {ticker: idx for idx, ticker in enumerate(tickers)}
+        self._values = values
+
+    def __len__(self):
+        """Number of dates"""
+        return len(self.dates)
+
+    def __contains__(self, ticker):
+        return ticker in self._columns
+
+    @property
+    def fields(self):
+        return tuple(self._values)
+
+    def __getitem__(self, field):
+        """Masked matrix of one field, e.g., pivot["total_profit"]"""
+        values = self._values[field]
+        return np.ma.masked_array(values, mask=~self.present | np.isnan(values))
+
+    def totals(self, field):
+        """Sum of a field over all tickers for each date (0 where no ticker has a value)"""
+        return self[field].sum(axis=1).filled(0)
+
+    def series(self, ticker, *fields):
+        """One ticker's values on the dates it has a record
+
+        Returns:
+            tuple: (list of dates, one float array per field)
+        """
+        column = self._columns[ticker]
+        rows = np.flatnonzero(self.present[:, column])
+        dates = [self.dates[row] for row in rows]
+        return (dates,) + tuple(self._values[field][rows, column] for field in fields)
+
+    def select(self, *tickers):
+        """Pivot of some tickers, restricted to the dates at least one of them has a record
+
+        Args:
+            tickers: Trading pairs, e.g., "BTC-USDC"
+
+        Returns:
+            SnapshotPivot with one column per ticker
+        """
+        columns = [self._columns[ticker] for ticker in tickers]
+        rows = np.flatnonzero(self.present[:, columns].any(axis=1))
+        return SnapshotPivot(
+            [self.dates[row] for row in rows],
+            list(tickers),
+            {field: values[np.ix_(rows, columns)] for field, values in self._values.items()},
+            self.present[np.ix_(rows, columns)],
+        )
+
+    def fingerprint(self):
+        """Hash of all dates, tickers and values"""
+        digest = hashlib.sha256()
+        digest.update(json.dumps([[date.isoformat() for date in self.dates], self.tickers, list(self._values)]).encode())
+        digest.update(self.present.tobytes())
+        for values in self._values.values():
+            digest.update(values.tobytes())
+        return digest.hexdigest()
+
+
+def _build_pivot(rows, fields):
+    """Build a SnapshotPivot from (date, ticker, values) rows in date order"""
+    rows = list(rows)
+    dates = sorted({row[0] for row in rows})
+    tickers = sorted({row[1] for row in rows})
+    row_index = {date: idx for idx, date in enumerate(dates)}
+    column_index = {ticker: idx for idx, ticker in enumerate(tickers)}
+
+    matrix = np.full((len(dates), len(tickers), len(fields)), np.nan)
+    present = np.zeros((len(dates), len(tickers)), dtype=bool)
+    if rows:
+        row_idx = np.fromiter((row_index[row[0]] for row in rows), dtype=np.intp, count=len(rows))
+        column_idx = np.fromiter((column_index[row[1]] for row in rows), dtype=np.intp, count=len(rows))
+        matrix[row_idx, column_idx] = np.array([row[2] for row in rows], dtype=float)
+        present[row_idx, column_idx] = True
+    values = {field: np.ascontiguousarray(matrix[:, :, idx]) for idx, field in enumerate(fields)}
+    return SnapshotPivot(dates, tickers, values, present)
+
+
+def pivot_records(history, section="profit"):
+    """Pivot snapshot dictionaries (as returned by load_profit_range/load_comparison_range)
+
+    Args:
+        history: Dictionary mapping date to a list of records (profit) or to
+            a dictionary holding the section (comparisons)
+        section: "profit", "roi_comparison" or "vs_btc_comparison"
+
+    Returns:
+        SnapshotPivot
+    """
+    fields = NUMERIC_FIELDS[section]
+    rows = []
+    for date in sorted(history):
+        records = history[date] if section == "profit" else history[date].get(section, [])
+        for record in records:
+            values = [record.get(field) for field in fields]
+            rows.append((date, record["ticker"], [np.nan if value is None else float(value) for value in values]))
+    return _build_pivot(rows, fields)
+
+
+def load_pivot(section="profit", start_date=None, end_date=None):
+    """Load one section for a date range straight into a SnapshotPivot
+
+    Args:
+        section: "profit", "roi_comparison" or "vs_btc_comparison"
+        start_date: First date, "YYYY-MM-DD" or "YYYYMMDD" (optional, defaults to the first stored date)
+        end_date: Last date, inclusive (optional, defaults to the last stored date)
+
+    Returns:
+        SnapshotPivot
+    """
+    table, _ = TABLES[section]
+    fields = NUMERIC_FIELDS[section]
+    start_key, end_key = _date_range(start_date, end_date)
+    with _lock:
+        rows = _get_connection().execute(
+            f"SELECT date, ticker, {', '.join(fields)} FROM {table} WHERE date BETWEEN ? AND ? ORDER BY date, position",
+            (start_key, end_key),
+        ).fetchall()
+    dates = {date_key: datetime.strptime(date_key, "%Y-%m-%d") for date_key in {row[0] for row in rows}}
+    return _build_pivot(
+        ((dates[row[0]], row[1], [np.nan if value is None else value for value in row[2:]]) for row in rows),
+        fields,
+    )
+
+
+def get_snapshot_dates():
+    """Get every date with a stored profit snapshot, oldest first (as "YYYY-MM-DD")"""
+    with _lock:
+        rows = _get_connection().execute("SELECT DISTINCT date FROM profit_snapshots ORDER BY date").fetchall()
+    return [row[0] for row in rows]
+
+
+def _has_rows(connection, section, date_key):
+    table, _ = TABLES[section]
+    return connection.execute(f"SELECT 1 FROM {table} WHERE date = ? LIMIT 1", (date_key,)).fetchone() is not None
+
+
+def _import_files(connection, profit_dir, comparison_dir, overwrite):
+    """Copy per-day JSON files into the store in one transaction
+
+    Args:
+        overwrite: If False, dates that already have rows in the store are skipped
+
+    Returns:
+        int: Number of files imported
+    """
+    imported = 0
+    with connection:
+        for file_path in sorted(glob.glob(os.path.join(profit_dir, "profit_begin_*.json"))):
+            date_key = to_date_key(os.path.basename(file_path).replace("profit_begin_", "").replace(".json", ""))
+            if not overwrite and _has_rows(connection, "profit", date_key):
+                continue
+            with open(file_path, "r") as f:
+                _replace_rows(connection, "profit", date_key, json.load(f))
+            imported += 1
+        for file_path in sorted(glob.glob(os.path.join(comparison_dir, "comparison_begin_*.json"))):
+            date_key = to_date_key(os.path.basename(file_path).replace("comparison_begin_", "").replace(".json", ""))
+            if not overwrite and _has_rows(connection, "roi_comparison", date_key):
+                continue
+            with open(file_path, "r") as f:
+                comparison = json.load(f)
+            for section in COMPARISON_SECTIONS:
+                _replace_rows(connection, section, date_key, comparison.get(section, []))
+            _replace_comparison_metadata(connection, date_key, comparison)
+            imported += 1
+    return imported
+
+
+def import_json_files(profit_dir=PROFIT_DIR, comparison_dir=COMPARISON_DIR):
+    """Import per-day profit_begin_*.json and comparison_begin_*.json files into the store
+
+    Files replace the stored rows of their dates.
+
+    Returns:
+        int: Number of files imported
+    """
+    with _lock:
+        return _import_files(_get_connection(), profit_dir, comparison_dir, overwrite=True)
+
+
+def export_json_files(start_date=None, end_date=None, profit_dir=PROFIT_DIR, comparison_dir=COMPARISON_DIR):
+    """Write stored snapshots back out as per-day profit_begin_*.json and comparison_begin_*.json files
+
+    Args:
+        start_date: First date to export (optional, defaults to the first stored date)
+        end_date: Last date to export, inclusive (optional, defaults to the last stored date)
+        profit_dir: Directory for profit_begin_YYYYMMDD.json files
+        comparison_dir: Directory for comparison_begin_YYYYMMDD.json files
+
+    Returns:
+        int: Number of files written
+    """
+    exported = 0
+    for date, profit_results in load_profit_range(start_date, end_date).items():
+        write_json_atomic(os.path.join(profit_dir, f"profit_begin_{date.strftime('%Y%m%d')}.json"), profit_results)
+        exported += 1
+    for date, comparison in load_comparison_range(start_date, end_date).items():
+        write_json_atomic(os.path.join(comparison_dir, f"comparison_begin_{date.strftime('%Y%m%d')}.json"), comparison)
+        exported += 1
+    return exported
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "export"
+    if command == "export":
+        count = export_json_files(*sys.argv[2:4])
+        print(f"✅ Exported {count} per-day JSON files from {STORE_PATH}")
+    elif command == "import":
+        count = import_json_files()
+        print(f"✅ Imported {count} per-day JSON files into {STORE_PATH}")
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,65 @@
+"""
+Tests that real API call paths go through the shared rate limiter
+
+Run with: python -m pytest -q test_rate_limiter.py
+"""
+
+import pytest
+
+import coinbase_client
+import rate_limiter
+from get_filled_history import iter_fill_pages
+from holdings import fetch_holdings
+
+
+class CountingLimiter(rate_limiter.RateLimiter):
+    def __init__(self):
+        super().__init__(rate=1000)
+        self.calls = 0
+
+    def acquire(self):
+        self.calls += 1
+        return super().acquire()
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {}
+
+    def __init__(self, payload):
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+
+class FakeSession:
+    def __init__(self):
+        self.paths = []
+
+    def get(self, url, headers=None, params=None, timeout=None):
+        self.paths.append(url.split(coinbase_client.API_HOST, 1)[1])
+        return FakeResponse({"accounts": [], "fills": [], "has_next": False, "cursor": ""})
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    session = FakeSession()
+    limiter = CountingLimiter()
+    monkeypatch.setattr(coinbase_client, "get_session", lambda: session)
+    monkeypatch.setattr(coinbase_client, "build_jwt", lambda uri: "token")
+    monkeypatch.setattr(rate_limiter, "API_RATE_LIMITER", limiter)
+    limiter.session = session
+    return limiter
+
+
+def test_accounts_request_takes_a_token(limiter):
+    fetch_holdings()
+    assert limiter.session.paths == ["/api/v3/brokerage/accounts"]
+    assert limiter.calls == 1
+
+
+def test_fills_request_takes_a_token(limiter):
+    list(iter_fill_pages({"limit": "100"}))
+    assert limiter.session.paths == ["/api/v3/brokerage/orders/historical/fills"]
+    assert limiter.calls == 1
@@ -0,0 +1,81 @@
+"""
+Regression tests for snapshots of coins traded on both X-USD and X-USDC
+
+Run with: python -m pytest -q test_snapshot_store.py
+"""
+
+import json
+
+import pytest
+
+import snapshot_store
+from trade_book import TradeBook
+
+
+def make_fill(trade_time, product_id, price, size):
+    return {
+        "trade_time": trade_time,
+        "trade_type": "FILL",
+        "price": str(price),
+        "size": str(size),
+        "product_id": product_id,
+        "commission": "0",
+        "side": "BUY",
+    }
+
+
+def profit_record(ticker, total_profit):
+    return {
+        "ticker": ticker, "total_buys": 100.0, "total_sells": 0.0, "hold_amount": 1.0,
+        "price_at_date": 100.0 + total_profit, "realized_profit": 0.0,
+        "unrealized_profit": total_profit, "total_profit": total_profit,
+    }
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Point the snapshot store at an empty temporary directory"""
+    monkeypatch.setattr(snapshot_store, "STORE_PATH", str(tmp_path / "profit_history" / "snapshots.sqlite3"))
+    monkeypatch.setattr(snapshot_store, "PROFIT_DIR", str(tmp_path / "profit_history"))
+    monkeypatch.setattr(snapshot_store, "COMPARISON_DIR", str(tmp_path / "comparison"))
+    monkeypatch.setattr(snapshot_store, "_connection", None)
+    yield tmp_path
+    if snapshot_store._connection is not None:
+        snapshot_store._connection.close()
+
+
+def test_mixed_usd_usdc_coin_is_listed_once():
+    book = TradeBook([
+        make_fill("2025-01-01T10:00:00.000000Z", "BTC-USD", 90000, 0.01),
+        make_fill("2025-01-02T10:00:00.000000Z", "BTC-USDC", 91000, 0.01),
+        make_fill("2025-01-02T11:00:00.000000Z", "ETH-USDC", 3300, 0.1),
+    ])
+    assert book.get_all_coins() == ["BTC", "ETH"]
+    assert book.up_to("2025-01-03T00:00:00Z").get_all_coins() == ["BTC", "ETH"]
+
+
+def test_save_snapshot_with_mixed_usd_usdc_coin(store):
+    book = TradeBook([
+        make_fill("2025-01-01T10:00:00.000000Z", "BTC-USD", 90000, 0.01),
+        make_fill("2025-01-02T10:00:00.000000Z", "BTC-USDC", 91000, 0.01),
+    ])
+    # Same loop as calculate_profit_by_date: one record per coin, keyed "<coin>-USDC"
+    profit_results = [profit_record(f"{coin}-USDC", 10.0) for coin in book.get_all_coins()]
+    snapshot_store.save_snapshot("2025-01-02", profit_results)
+
+    # Records that still list a ticker twice replace each other instead of failing
+    snapshot_store.save_snapshot("2025-01-03", [profit_record("BTC-USDC", 10.0), profit_record("BTC-USDC", 12.0)])
+
+    history = snapshot_store.load_profit_range()
+    assert [len(records) for records in history.values()] == [1, 1]
+    assert list(history.values())[1][0]["total_profit"] == 12.0
+
+
+def test_legacy_import_with_duplicate_tickers(store):
+    profit_dir = store / "profit_history"
+    profit_dir.mkdir()
+    with open(profit_dir / "profit_begin_20250101.json", "w") as f:
+        json.dump([profit_record("BTC-USDC", 10.0), profit_record("BTC-USDC", 10.0)], f)
+
+    # The store opens (and imports the file) instead of failing on the duplicate key
+    assert snapshot_store.get_snapshot_dates() == ["2025-01-01"]
@@ -0,0 +1,463 @@
+"""
+Per-ticker index over the trade history, built in a single pass
+"""
+
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, namedtuple
+from collections.abc import Sequence
+from datetime import datetime, timezone, timedelta
+from itertools import islice
+
+# One parsed fill; prices, sizes and commissions are already floats
+Fill = namedtuple("Fill", ["trade_time", "product_id", "side", "price", "size", "commission"])
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class ListView(Sequence):
+    """Read-only view of items[start:stop] that does not copy the list"""
+
+    __slots__ = ("_items", "_start", "_stop")
+
+    def __init__(self, items, start=0, stop=None):
+        self._items = items
+        self._start = start
+        self._stop = len(items) if stop is None else stop
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            indices = range(self._start, self._stop)[index]
+            if indices.step == 1:
+                return ListView(self._items, indices.start, max(indices.start, indices.stop))
+            return [self._items[i] for i in indices]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("ListView index out of range")
+        return self._items[self._start + index]
+
+    def __iter__(self):
+        return islice(self._items, self._start, self._stop)
+
+    def __repr__(self):
+        return f"ListView({list(self)!r})"
+
+
+class TradeBook:
+    """Trade history grouped by product_id and sorted by trade_time
+
+    Every fill is parsed once when the book is built, so the profit and
+    comparison functions can look up a ticker without rescanning the whole
+    trade list. Trade times are also kept as epoch microseconds, so
+    up_to() and window() select fills with a binary search.
+    """
+
+    def __init__(self, trade_history):
+        """Build the index
+
+        Args:
+            trade_history: List of trade records as stored in filled_*.json
+        """
+        keyed = sorted(((to_epoch_us(trade["trade_time"]), trade) for trade in trade_history), key=lambda x: x[0])
+        self.trades = [trade for _, trade in keyed]
+        self.epochs = [epoch for epoch, _ in keyed]
+        self.fills = []
+        self._fills_by_ticker = defaultdict(list)
+        self._epochs_by_ticker = defaultdict(list)
+        self._extracted = {}
+        self._position_ledger = None
+
+        for epoch, trade in keyed:
+            fill = Fill(
+                trade["trade_time"],
+                trade["product_id"],
+                trade["side"],
+                float(trade["price"]),
+                float(trade["size"]),
+                float(trade["commission"]),
+            )
+            self.fills.append(fill)
+            self._fills_by_ticker[fill.product_id].append(fill)
+            self._epochs_by_ticker[fill.product_id].append(epoch)
+
+    def __len__(self):
+        return len(self.trades)
+
+    @property
+    def product_ids(self):
+        """All traded product ids, e.g., "BTC-USDC" """
+        return list(self._fills_by_ticker.keys())
+
+    def get_all_coins(self):
+        """Get list of all coins traded against USD or USDC
+
+        A coin traded on both X-USD and X-USDC is listed once.
+        """
+        coins = []
+        for ticker in self._fills_by_ticker:
+            if ticker.endswith("-USDC") or ticker.endswith("-USD"):
+                coins.append(ticker.split("-")[0])
+        return list(dict.fromkeys(coins))
+
+    def ticker_fills(self, ticker):
+        """Get the fills of a ticker, sorted by trade_time"""
+        return self._fills_by_ticker.get(ticker, [])
+
+    def first_trade_price(self, ticker):
+        """Price of the first trade of a ticker, or None if it was never traded"""
+        fills = self.ticker_fills(ticker)
+        return fills[0].price if fills else None
+
+    def last_trade_price(self, ticker):
+        """Price of the most recent trade of a ticker, or None if it was never traded"""
+        fills = self.ticker_fills(ticker)
+        return fills[-1].price if fills else None
+
+    def position_ledger(self):
+        """Get the PositionLedger of this book (built on first use)"""
+        if self._position_ledger is None:
+            self._position_ledger = PositionLedger(self.fills, self.epochs)
+        return self._position_ledger
+
+    def window(self, start=None, end=None):
+        """Select the fills with start <= trade_time < end
+
+        Args:
+            start: datetime or ISO 8601 string (optional, defaults to the first fill)
+            end: datetime or ISO 8601 string (optional, defaults to after the last fill)
+
+        Returns:
+            TradeView over the window (no trades are copied)
+        """
+        start_us = to_epoch_us(start) if start is not None else None
+        end_us = to_epoch_us(end) if end is not None else None
+        return TradeView(self, start_us, end_us)
+
+    def up_to(self, at):
+        """Select the fills with trade_time <= at (see window)"""
+        return TradeView(self, None, to_epoch_us(at) + 1)
+
+    def extract(self, ticker):
+        """Extract trade data for a ticker
+
+        Returns:
+            dict: Same fields as extract_ticker_trades, plus first_buy_time,
+            first_price and last_price
+        """
+        if ticker not in self._extracted:
+            self._extracted[ticker] = summarize_fills(self.ticker_fills(ticker))
+        return self._extracted[ticker]
+
+
+class TradeView:
+    """Fills of a TradeBook in a time window [start_us, end_us)
+
+    Offers the same lookups as a TradeBook built from just those trades, but
+    selects them with a binary search over the book's epoch arrays and never
+    copies the underlying lists.
+    """
+
+    def __init__(self, trade_book, start_us=None, end_us=None):
+        """
+        Args:
+            trade_book: TradeBook to select from
+            start_us: Window start as epoch microseconds, inclusive (None for unbounded)
+            end_us: Window end as epoch microseconds, exclusive (None for unbounded)
+        """
+        self._trade_book = trade_book
+        self._start_us = start_us
+        self._end_us = end_us
+        self._lo, self._hi = self._bounds(trade_book.epochs)
+        self._extracted = {}
+
+    def _bounds(self, epochs):
+        lo = bisect_left(epochs, self._start_us) if self._start_us is not None else 0
+        hi = bisect_left(epochs, self._end_us) if self._end_us is not None else len(epochs)
+        return lo, max(lo, hi)
+
+    def __len__(self):
+        return self._hi - self._lo
+
+    @property
+    def trades(self):
+        """Trade records in the window"""
+        return ListView(self._trade_book.trades, self._lo, self._hi)
+
+    @property
+    def fills(self):
+        """Fills in the window"""
+        return ListView(self._trade_book.fills, self._lo, self._hi)
+
+    @property
+    def product_ids(self):
+        """Product ids with at least one fill in the window"""
+        return [ticker for ticker in self._trade_book.product_ids if self.ticker_fills(ticker)]
+
+    def get_all_coins(self):
+        """Get list of all coins traded against USD or USDC in the window (each coin once)"""
+        coins = []
+        for ticker in self.product_ids:
+            if ticker.endswith("-USDC") or ticker.endswith("-USD"):
+                coins.append(ticker.split("-")[0])
+        return list(dict.fromkeys(coins))
+
+    def ticker_fills(self, ticker):
+        """Get the fills of a ticker in the window, sorted by trade_time"""
+        epochs = self._trade_book._epochs_by_ticker.get(ticker)
+        if not epochs:
+            return []
+        lo, hi = self._bounds(epochs)
+        return ListView(self._trade_book.ticker_fills(ticker), lo, hi)
+
+    def first_trade_price(self, ticker):
+        """Price of the first trade of a ticker in the window, or None"""
+        fills = self.ticker_fills(ticker)
+        return fills[0].price if fills else None
+
+    def last_trade_price(self, ticker):
+        """Price of the last trade of a ticker in the window, or None"""
+        fills = self.ticker_fills(ticker)
+        return fills[-1].price if fills else None
+
+    def extract(self, ticker):
+        """Extract trade data for a ticker (see TradeBook.extract)"""
+        if ticker not in self._extracted:
+            self._extracted[ticker] = summarize_fills(self.ticker_fills(ticker))
+        return self._extracted[ticker]
+
+
+def summarize_fills(fills):
+    """Sum a ticker's fills into the trade data returned by TradeBook.extract"""
+    buys = []
+    sells = []
+    buy_sizes = []
+    sell_sizes = []
+    buy_times = []
+
+    for fill in fills:
+        if fill.side == "BUY":
+            buys.append(fill.price * fill.size + fill.commission)
+            buy_sizes.append(fill.size)
+            buy_times.append(fill.trade_time)
+        elif fill.side == "SELL":
+            sells.append(fill.price * fill.size - fill.commission)
+            sell_sizes.append(fill.size)
+
+    trades_data = {
+        "buys": buys,
+        "sells": sells,
+        "buy_sizes": buy_sizes,
+        "sell_sizes": sell_sizes,
+        "buy_times": buy_times,
+        "total_buys": sum(buys),
+        "total_sells": sum(sells),
+        "total_buy_size": sum(buy_sizes),
+        "total_sell_size": sum(sell_sizes),
+        "first_buy_time": min(buy_times) if buy_times else None,
+        "first_price": fills[0].price if fills else None,
+        "last_price": fills[-1].price if fills else None,
+    }
+    return trades_data
+
+
+class PositionLedger:
+    """Held quantity of each coin over time, rebuilt from the fill history
+
+    The position after each fill is the cumulative BUY size minus SELL size of
+    every pair with the coin as base currency. For pairs quoted in another
+    coin (e.g., ETH-BTC) the quote coin's position moves by the notional.
+    Deposits, withdrawals and rewards are not fills, so compare against live
+    balances with reconcile().
+    """
+
+    # Quote currencies treated as cash; their balances are not tracked
+    CASH_CURRENCIES = ("USD", "USDC")
+
+    def __init__(self, fills, epochs=None):
+        """
+        Args:
+            fills: Fill tuples, e.g., TradeBook.fills
+            epochs: Trade times of the fills as epoch microseconds (optional, parsed if not provided)
+        """
+        if epochs is None:
+            epochs = [to_epoch_us(fill.trade_time) for fill in fills]
+        changes = defaultdict(list)
+        for fill, timestamp in zip(fills, epochs):
+            if fill.side == "BUY":
+                direction = 1
+            elif fill.side == "SELL":
+                direction = -1
+            else:
+                continue
+            base, _, quote = fill.product_id.partition("-")
+            changes[base].append((timestamp, direction * fill.size))
+            if quote and quote not in self.CASH_CURRENCIES:
+                changes[quote].append((timestamp, -direction * (fill.price * fill.size + direction * fill.commission)))
+
+        self._times = {}
+        self._positions = {}
+        for coin, coin_changes in changes.items():
+            coin_changes.sort(key=lambda change: change[0])
+            position = 0.0
+            times = []
+            positions = []
+            for timestamp, delta in coin_changes:
+                position += delta
+                times.append(timestamp)
+                positions.append(position)
+            self._times[coin] = times
+            self._positions[coin] = positions
+
+    @property
+    def coins(self):
+        """All coins with at least one position change"""
+        return list(self._times.keys())
+
+    def position_at(self, coin, at=None):
+        """Quantity of a coin held at a time
+
+        Args:
+            coin: Currency, e.g., "BTC"
+            at: datetime or ISO 8601 string (optional, defaults to after the last fill)
+
+        Returns:
+            float: Position including every fill at or before `at` (0 before the first fill)
+        """
+        positions = self._positions.get(coin)
+        if not positions:
+            return 0.0
+        if at is None:
+            return round(positions[-1], 8)
+        idx = bisect_right(self._times[coin], to_epoch_us(at))
+        return round(positions[idx - 1], 8) if idx > 0 else 0.0
+
+    def holdings_at(self, at=None):
+        """Holdings at a time, in the same format as get_hold()
+
+        Returns:
+            dict: Mapping coin to {"ticker": coin, "hold": amount} for positive positions
+        """
+        holdings = {}
+        for coin in self._positions:
+            amount = self.position_at(coin, at)
+            if amount > 0:
+                holdings[coin] = {"ticker": coin, "hold": amount}
+        return holdings
+
+    def reconcile(self, live_hold, at=None, tolerance=1e-6):
+        """Compare ledger positions with live balances
+
+        Args:
+            live_hold: Holdings as returned by get_hold()
+            at: Time of the live balances (optional, defaults to after the last fill)
+            tolerance: Largest difference treated as a match
+
+        Returns:
+            dict: Mapping coin to {"ledger", "live", "difference"} for every
+            traded coin whose positions differ
+        """
+        mismatches = {}
+        for coin in self._positions:
+            if coin in self.CASH_CURRENCIES:
+                continue
+            ledger_amount = max(self.position_at(coin, at), 0.0)
+            live_amount = live_hold.get(coin, {}).get("hold", 0)
+            if abs(live_amount - ledger_amount) > tolerance:
+                mismatches[coin] = {
+                    "ledger": ledger_amount,
+                    "live": live_amount,
+                    "difference": round(live_amount - ledger_amount, 8),
+                }
+        return mismatches
+
+
+class TradeSnapshot:
+    """Cumulative per-ticker trade data up to a cutoff time
+
+    Produced by a forward sweep over a TradeBook (see
+    calculate_profit_by_date.sweep_trade_snapshots) and offers the same
+    lookups as a TradeBook built from the trades up to the cutoff.
+    """
+
+    def __init__(self, trade_book, trade_count, ticker_data):
+        """
+        Args:
+            trade_book: TradeBook the snapshot was taken from
+            trade_count: Number of (time-sorted) trades up to the cutoff
+            ticker_data: Mapping product_id to cumulative trade data
+        """
+        self._trade_book = trade_book
+        self._trade_count = trade_count
+        self._ticker_data = ticker_data
+
+    def __len__(self):
+        return self._trade_count
+
+    @property
+    def trades(self):
+        """Trade records up to the cutoff (a view, not a copy)"""
+        return ListView(self._trade_book.trades, 0, self._trade_count)
+
+    def get_all_coins(self):
+        """Get list of all coins traded against USD or USDC up to the cutoff (each coin once)"""
+        coins = []
+        for ticker in self._ticker_data:
+            if ticker.endswith("-USDC") or ticker.endswith("-USD"):
+                coins.append(ticker.split("-")[0])
+        return list(dict.fromkeys(coins))
+
+    def first_trade_price(self, ticker):
+        """Price of the first trade of a ticker, or None if it was not traded yet"""
+        return self.extract(ticker)["first_price"]
+
+    def last_trade_price(self, ticker):
+        """Price of the last trade of a ticker before the cutoff, or None"""
+        return self.extract(ticker)["last_price"]
+
+    def extract(self, ticker):
+        """Get cumulative trade data for a ticker (totals, first_buy_time, first_price, last_price)"""
+        return self._ticker_data.get(ticker) or new_ticker_data()
+
+
+def new_ticker_data():
+    """Empty cumulative trade data for a ticker"""
+    return {
+        "total_buys": 0,
+        "total_sells": 0,
+        "total_buy_size": 0,
+        "total_sell_size": 0,
+        "first_buy_time": None,
+        "first_price": None,
+        "last_price": None,
+    }
+
+
+def add_fill(ticker_data, fill):
+    """Add one fill to cumulative trade data, in trade_time order"""
+    if fill.side == "BUY":
+        ticker_data["total_buys"] += fill.price * fill.size + fill.commission
+        ticker_data["total_buy_size"] += fill.size
+        if ticker_data["first_buy_time"] is None:
+            ticker_data["first_buy_time"] = fill.trade_time
+    elif fill.side == "SELL":
+        ticker_data["total_sells"] += fill.price * fill.size - fill.commission
+        ticker_data["total_sell_size"] += fill.size
+    if ticker_data["first_price"] is None:
+        ticker_data["first_price"] = fill.price
+    ticker_data["last_price"] = fill.price
+
+
+def parse_trade_time(trade_time):
+    """Parse an ISO 8601 trade_time (or pass a datetime through) as an aware datetime"""
+    if isinstance(trade_time, datetime):
+        return trade_time if trade_time.tzinfo else trade_time.replace(tzinfo=timezone.utc)
+    return datetime.fromisoformat(trade_time.replace('Z', '+00:00'))
+
+
+def to_epoch_us(trade_time):
+    """Convert an ISO 8601 trade_time (or datetime) to epoch microseconds (UTC)"""
+    return (parse_trade_time(trade_time) - _EPOCH) // timedelta(microseconds=1)
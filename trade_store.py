@@ -0,0 +1,228 @@
+"""
+Columnar on-disk copy of the trade history
+
+Each field is stored as its own NumPy array under
+./trade_cache/filled_<range>_columns/ and loaded memory-mapped, so reading
+the full history costs no JSON parsing and no per-fill float() calls.
+
+The store is a cache rebuilt from filled_<range>.json whenever that file
+changes, so it lives outside trade_history/ and is not committed.
+"""
+
+import json
+import os
+from datetime import datetime, timezone, timedelta
+
+import numpy as np
+
+from trade_book import to_epoch_us
+from utils import load_json_records
+
+TRADE_HISTORY_DIR = "./trade_history"
+TRADE_CACHE_DIR = "./trade_cache"
+
+SIDE_CODES = {"BUY": 1, "SELL": -1}
+SIDE_NAMES = {code: name for name, code in SIDE_CODES.items()}
+
+# Column name -> dtype
+COLUMNS = {
+    "trade_time_us": np.int64,   # Epoch microseconds (UTC)
+    "product_idx": np.int32,     # Index into meta.json "products"
+    "side": np.int8,             # 1 = BUY, -1 = SELL, 0 = other
+    "price": np.float64,
+    "size": np.float64,
+    "commission": np.float64,
+}
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def get_columns_dir(range="alltime"):
+    """Directory holding the columnar store for a trade history file"""
+    return f"{TRADE_CACHE_DIR}/filled_{range}_columns"
+
+
+def _column_path(columns_dir, name, version):
+    """Path of one column file of a store version"""
+    return os.path.join(columns_dir, f"{name}.{version}.npy")
+
+
+def from_epoch_us(epoch_us):
+    """Convert epoch microseconds back to an ISO 8601 trade_time"""
+    dt = _EPOCH + timedelta(microseconds=int(epoch_us))
+    return dt.isoformat(timespec='microseconds').replace('+00:00', 'Z')
+
+
+def trades_to_columns(trades, products=None):
+    """Convert trade records into column arrays, sorted by trade_time
+
+    Args:
+        trades: List of trade records as stored in filled_*.json
+        products: Existing product list to extend (optional)
+
+    Returns:
+        dict: Column arrays plus "products" (list of product ids)
+    """
+    products = list(products or [])
+    product_index = {product_id: idx for idx, product_id in enumerate(products)}
+
+    count = len(trades)
+    columns = {name: np.empty(count, dtype=dtype) for name, dtype in COLUMNS.items()}
+    for row, trade in enumerate(trades):
+        product_id = trade["product_id"]
+        if product_id not in product_index:
+            product_index[product_id] = len(products)
+            products.append(product_id)
+        columns["trade_time_us"][row] = to_epoch_us(trade["trade_time"])
+        columns["product_idx"][row] = product_index[product_id]
+        columns["side"][row] = SIDE_CODES.get(trade["side"], 0)
+        columns["price"][row] = float(trade["price"])
+        columns["size"][row] = float(trade["size"])
+        columns["commission"][row] = float(trade["commission"])
+
+    order = np.argsort(columns["trade_time_us"], kind="stable")
+    for name in COLUMNS:
+        columns[name] = columns[name][order]
+    columns["products"] = products
+    return columns
+
+
+def columns_to_trades(columns):
+    """Export column arrays back to trade records (the filled_*.json layout)"""
+    products = columns["products"]
+    trades = []
+    for row in range(len(columns["trade_time_us"])):
+        trades.append({
+            "trade_time": from_epoch_us(columns["trade_time_us"][row]),
+            "trade_type": "FILL",
+            "price": repr(float(columns["price"][row])),
+            "size": repr(float(columns["size"][row])),
+            "product_id": products[int(columns["product_idx"][row])],
+            "commission": repr(float(columns["commission"][row])),
+            "side": SIDE_NAMES.get(int(columns["side"][row]), "UNKNOWN"),
+        })
+    return trades
+
+
+def save_trade_columns(columns, range="alltime", source_path=None):
+    """Write column arrays to disk
+
+    The arrays are written as a new version next to the current one, and
+    meta.json (which names the version to read) is replaced last in a single
+    rename. A crash at any point leaves meta.json pointing at a complete set
+    of files; files of older versions are removed once the switch is done.
+
+    Args:
+        columns: Column arrays plus "products", as returned by trades_to_columns
+        range: Trade history range, e.g., "alltime"
+        source_path: JSON file the columns were built from (optional, recorded for staleness checks)
+    """
+    columns_dir = get_columns_dir(range)
+    os.makedirs(columns_dir, exist_ok=True)
+    meta_path = os.path.join(columns_dir, "meta.json")
+    version = 1
+    if os.path.exists(meta_path):
+        with open(meta_path, "r") as f:
+            version = json.load(f).get("version", 0) + 1
+
+    for name, dtype in COLUMNS.items():
+        with open(_column_path(columns_dir, name, version), "wb") as f:
+            np.save(f, np.ascontiguousarray(columns[name], dtype=dtype))
+
+    meta = {
+        "version": version,
+        "count": int(len(columns["trade_time_us"])),
+        "products": list(columns["products"]),
+    }
+    if source_path and os.path.exists(source_path):
+        stat = os.stat(source_path)
+        meta["source_mtime_ns"] = stat.st_mtime_ns
+        meta["source_size"] = stat.st_size
+    with open(meta_path + ".tmp", "w") as f:
+        json.dump(meta, f, indent=4)
+    os.replace(meta_path + ".tmp", meta_path)
+
+    current = {os.path.basename(_column_path(columns_dir, name, version)) for name in COLUMNS}
+    for filename in os.listdir(columns_dir):
+        if filename.endswith(".npy") and filename not in current:
+            try:
+                os.remove(os.path.join(columns_dir, filename))
+            except OSError:
+                pass  # Still mapped by a reader on some platforms; removed next time
+
+
+def load_trade_columns(range="alltime", mmap=True):
+    """Load column arrays from disk
+
+    Args:
+        range: Trade history range, e.g., "alltime"
+        mmap: If True, memory-map the arrays instead of reading them
+
+    Returns:
+        dict: Column arrays plus "products", or None if the store does not exist
+    """
+    columns_dir = get_columns_dir(range)
+    meta_path = os.path.join(columns_dir, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+
+    with open(meta_path, "r") as f:
+        meta = json.load(f)
+
+    if "version" not in meta:
+        return None  # Written by an older layout; rebuilt by the caller
+
+    columns = {}
+    for name in COLUMNS:
+        columns[name] = np.load(_column_path(columns_dir, name, meta["version"]), mmap_mode="r" if mmap else None)
+    columns["products"] = meta["products"]
+    columns["meta"] = meta
+    return columns
+
+
+def is_stale(columns, range="alltime"):
+    """Check whether the columnar store is older than filled_<range>.json"""
+    source_path = f"{TRADE_HISTORY_DIR}/filled_{range}.json"
+    if columns is None:
+        return True
+    if not os.path.exists(source_path):
+        return False
+    stat = os.stat(source_path)
+    meta = columns["meta"]
+    return meta.get("source_mtime_ns") != stat.st_mtime_ns or meta.get("source_size") != stat.st_size
+
+
+def build_trade_columns(trades, range="alltime"):
+    """Rebuild the columnar store from trade records and save it"""
+    columns = trades_to_columns(trades)
+    save_trade_columns(columns, range, source_path=f"{TRADE_HISTORY_DIR}/filled_{range}.json")
+    return load_trade_columns(range)
+
+
+def append_trade_columns(trades, range="alltime"):
+    """Append new trade records to an existing columnar store
+
+    Returns:
+        dict: The updated columns, or None if the store does not exist yet
+        (use build_trade_columns for the initial build)
+    """
+    existing = load_trade_columns(range, mmap=False)
+    if existing is None:
+        return None
+    new = trades_to_columns(trades, products=existing["products"])
+    merged = {name: np.concatenate([existing[name], new[name]]) for name in COLUMNS}
+    order = np.argsort(merged["trade_time_us"], kind="stable")
+    for name in COLUMNS:
+        merged[name] = merged[name][order]
+    merged["products"] = new["products"]
+    save_trade_columns(merged, range, source_path=f"{TRADE_HISTORY_DIR}/filled_{range}.json")
+    return load_trade_columns(range)
+
+
+def load_or_build_trade_columns(range="alltime"):
+    """Load the columnar store, rebuilding it from JSON if missing or stale"""
+    columns = load_trade_columns(range)
+    if is_stale(columns, range):
+        trades = load_json_records(f"{TRADE_HISTORY_DIR}/filled_{range}.json")
+        columns = build_trade_columns(trades, range)
+    return columns
@@ -3,6 +3,9 @@ import jwt
 from cryptography.hazmat.primitives import serialization
 import time
 import secrets
+import json
+import tempfile
+import threading
 from dotenv import load_dotenv
 import os
 
@@ -11,21 +14,252 @@ API_KEY_ID = os.getenv("COINBASE_API_KEY")
 API_SECRET = os.getenv("COINBASE_API_SECRET_KEY")
 
 
-def build_jwt(uri):
-    private_key_bytes = API_SECRET.encode('utf-8')
-    private_key = serialization.load_pem_private_key(private_key_bytes, password=None)
+JWT_LIFETIME_SECONDS = 120
+# Stop reusing a cached token this many seconds before it expires
+JWT_REFRESH_MARGIN_SECONDS = 30
+# Set COINBASE_JWT_CACHE=0 to sign a fresh token for every request
+JWT_CACHE_ENABLED = os.getenv("COINBASE_JWT_CACHE", "1") != "0"
+
+_private_key = None
+_jwt_cache = {}
+_jwt_lock = threading.Lock()
+
+
+def get_private_key():
+    """Parse the API private key on first use and keep it for the process"""
+    global _private_key
+    if _private_key is None:
+        private_key_bytes = API_SECRET.encode('utf-8')
+        _private_key = serialization.load_pem_private_key(private_key_bytes, password=None)
+    return _private_key
+
+
+def sign_jwt(uri):
+    """Sign a new JWT for a request URI
+    
+    Returns:
+        tuple: (jwt_token, exp)
+    """
+    now = int(time.time())
     jwt_payload = {
         'sub': API_KEY_ID,
         'iss': "cdp",
-        'nbf': int(time.time()),
-        'exp': int(time.time()) + 120,
+        'nbf': now,
+        'exp': now + JWT_LIFETIME_SECONDS,
         'uri': uri,
     }
     jwt_token = jwt.encode(
         jwt_payload,
-        private_key,
+        get_private_key(),
         algorithm='ES256',
         headers={'kid': API_KEY_ID, 'nonce': secrets.token_hex()},
     )
-    return jwt_token
+    return jwt_token, jwt_payload['exp']
+
+
+def build_jwt(uri):
+    """Get a JWT for a request URI, e.g., "GET api.coinbase.com/api/v3/brokerage/accounts"
+    
+    Tokens are cached per URI and reused until JWT_REFRESH_MARGIN_SECONDS
+    before they expire, unless JWT_CACHE_ENABLED is off.
+    """
+    if not JWT_CACHE_ENABLED:
+        return sign_jwt(uri)[0]
+    
+    with _jwt_lock:
+        cached = _jwt_cache.get(uri)
+        if cached and cached[1] - JWT_REFRESH_MARGIN_SECONDS > time.time():
+            return cached[0]
+        jwt_token, exp = sign_jwt(uri)
+        _jwt_cache[uri] = (jwt_token, exp)
+        return jwt_token
+
+
+# Separators for compact (minified) JSON output
+COMPACT_SEPARATORS = (",", ":")
+
+
+def dumps_compact(data):
+    """Serialize data as minified JSON"""
+    return json.dumps(data, separators=COMPACT_SEPARATORS)
+
+
+def _write_atomic(file_path, write):
+    """Call write(f) on a temporary file, fsync it, then rename it over file_path
+
+    Readers (and concurrent writers) never see a half-written file.
+    """
+    directory = os.path.dirname(file_path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_", suffix=os.path.splitext(file_path)[1])
+    try:
+        with os.fdopen(fd, "w") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def write_json_atomic(file_path, data, indent=None):
+    """Write JSON atomically (see _write_atomic)
+
+    Args:
+        file_path: Target file
+        data: JSON-serializable data
+        indent: Indentation for human-readable output (default: compact)
+    """
+    if indent is None:
+        _write_atomic(file_path, lambda f: json.dump(data, f, separators=COMPACT_SEPARATORS))
+    else:
+        _write_atomic(file_path, lambda f: json.dump(data, f, indent=indent))
+
+
+def write_json_records_atomic(file_path, records):
+    """Stream records to file_path one per line, atomically (see _write_atomic)
+
+    .jsonl files are written as JSON Lines; any other file as a compact JSON
+    list with one record per line, which json.load still reads. Records are
+    serialized one at a time, so the full document is never built in memory.
+
+    Args:
+        file_path: Target file
+        records: Iterable of JSON-serializable records
+    """
+    json_lines = file_path.endswith(".jsonl")
+
+    def write(f):
+        first = True
+        if not json_lines:
+            f.write("[")
+        for record in records:
+            if json_lines:
+                f.write(dumps_compact(record) + "\n")
+            else:
+                f.write(("\n" if first else ",\n") + dumps_compact(record))
+            first = False
+        if not json_lines:
+            f.write("\n]\n" if not first else "]\n")
+
+    _write_atomic(file_path, write)
+
+
+def iter_json_records(file_path, object_hook=None):
+    """Read records from a JSON list file (any layout) or a JSON Lines file
+
+    Args:
+        file_path: File to read
+        object_hook: Passed to json.load / json.loads (optional)
+
+    Yields:
+        Each record in file order
+    """
+    with open(file_path, "r") as f:
+        first_char = ""
+        while True:
+            first_char = f.read(1)
+            if not first_char or not first_char.isspace():
+                break
+        f.seek(0)
+        if first_char == "[":
+            yield from json.load(f, object_hook=object_hook)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line, object_hook=object_hook)
+
+
+def load_json_records(file_path, object_hook=None):
+    """Load all records from a JSON list or JSON Lines file (see iter_json_records)"""
+    return list(iter_json_records(file_path, object_hook=object_hook))
+
+
+def get_journal_path(file_path):
+    """Journal used to undo an interrupted append_json_records"""
+    return file_path + ".journal"
+
+
+def recover_json_records(file_path):
+    """Undo an append_json_records that was interrupted by a crash
+
+    Returns:
+        bool: True if an interrupted append was rolled back
+    """
+    journal_path = get_journal_path(file_path)
+    if not os.path.exists(journal_path):
+        return False
+    try:
+        with open(journal_path, "r") as f:
+            journal = json.load(f)
+    except ValueError:
+        # Crashed while writing the journal, before the file was touched
+        os.remove(journal_path)
+        return False
+    with open(file_path, "rb+") as f:
+        f.truncate(journal["offset"])
+        f.seek(journal["offset"])
+        f.write(journal["tail"].encode("latin-1"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.remove(journal_path)
+    return True
+
+
+def append_json_records(file_path, records):
+    """Append records to a JSON list or JSON Lines file in place
+
+    Only the end of the file is rewritten, without reading the rest. The
+    bytes being replaced are first saved to a journal, so a crash mid-append
+    is rolled back by recover_json_records (called again here on the next
+    append).
+    """
+    if not records:
+        return
+    recover_json_records(file_path)
+    with open(file_path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        f.seek(0)
+        head = f.read(64).lstrip()
+        json_lines = not head.startswith(b"[")
+
+        if json_lines:
+            offset = end
+            tail = b""
+            f.seek(end - 1 if end > 0 else 0)
+            needs_newline = end > 0 and f.read(1) != b"\n"
+            data = ("\n" if needs_newline else "") + "".join(dumps_compact(r) + "\n" for r in records)
+        else:
+            pos = end
+            tail = b""
+            # Walk back past trailing whitespace, the closing bracket and the
+            # whitespace before it, to the last record (or the opening bracket)
+            while pos > 0 and len(tail.rstrip().rstrip(b"]").rstrip()) == 0:
+                step = min(pos, 4096)
+                pos -= step
+                f.seek(pos)
+                tail = f.read(step) + tail
+            body = tail.rstrip()
+            if not body.endswith(b"]"):
+                raise ValueError(f"{file_path} does not end with a JSON list")
+            body = body[:-1].rstrip()
+            is_empty = body.endswith(b"[")
+            offset = pos + len(body)
+            tail = tail[len(body):]
+            data = ("\n" if is_empty else ",\n") + ",\n".join(dumps_compact(r) for r in records) + "\n]\n"
+
+        journal_path = get_journal_path(file_path)
+        with open(journal_path, "w") as journal:
+            json.dump({"offset": offset, "tail": tail.decode("latin-1")}, journal)
+            journal.flush()
+            os.fsync(journal.fileno())
 
+        f.seek(offset)
+        f.truncate()
+        f.write(data.encode("utf-8"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.remove(journal_path)
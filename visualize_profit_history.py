@@ -1,216 +1,240 @@
+import contextlib
+import hashlib
+import io
 import json
 import os
-import glob
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import numpy as np
 import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend
+matplotlib.use('Agg')  # Use non-interactive backend (also in every worker process)
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
-from collections import defaultdict
+from snapshot_store import (
+    SnapshotPivot,
+    load_profit_range,
+    load_comparison_range,
+    load_pivot,
+    pivot_records,
+)
+from utils import COMPACT_SEPARATORS, write_json_atomic
 
-def load_all_profit_files():
-    """Load all profit history files
+CHARTS_DIR = "./charts"
+# Fingerprint of the inputs of every chart file, so unchanged charts are not rendered again
+RENDER_MANIFEST_FILE = f"{CHARTS_DIR}/render_manifest.json"
+# Bump when the chart code changes, so every chart is rendered again
+RENDER_VERSION = 1
+
+# Worker processes for chart rendering (0 = one per CPU core, 1 = render in this process)
+CHART_WORKERS = int(os.environ.get("CHART_WORKERS", "0"))
+# Also render a separate chart file for every coin
+CHART_PER_COIN = os.environ.get("CHART_PER_COIN", "1") == "1"
+# Render every chart, even if its inputs did not change
+CHART_FORCE = os.environ.get("CHART_FORCE", "0") == "1"
+# Output format ("png" or "svg") and resolution, e.g., CHART_DPI=72 for quick previews
+CHART_FORMAT = os.environ.get("CHART_FORMAT", "png")
+CHART_DPI = int(os.environ.get("CHART_DPI", "300"))
+# Largest rendered figure in pixels (width x height); charts with more coins are split into pages
+MAX_CHART_PIXELS = int(os.environ.get("MAX_CHART_PIXELS", "30000000"))
+PANEL_WIDTH_INCHES = 12
+PANEL_HEIGHT_INCHES = 4
+
+def load_all_profit_files(start_date=None, end_date=None):
+    """Load profit history from the snapshot store
+    
+    Args:
+        start_date: First date, "YYYY-MM-DD" (optional, defaults to the first stored date)
+        end_date: Last date, inclusive (optional, defaults to the last stored date)
     
     Returns:
         Dictionary mapping date to profit data
     """
-    profit_files = glob.glob("./profit_history/profit_begin_*.json")
-    
-    profit_data = {}
-    for file_path in profit_files:
-        # Extract date from filename
-        filename = os.path.basename(file_path)
-        date_str = filename.replace("profit_begin_", "").replace(".json", "")
-        
-        # Convert YYYYMMDD to datetime
-        date = datetime.strptime(date_str, "%Y%m%d")
-        
-        with open(file_path, "r") as f:
-            data = json.load(f)
-        
-        profit_data[date] = data
-    
-    return profit_data
+    return load_profit_range(start_date, end_date)
 
-def load_all_comparison_files():
-    """Load all comparison history files
+def load_all_comparison_files(start_date=None, end_date=None):
+    """Load comparison history from the snapshot store
+    
+    Args:
+        start_date: First date, "YYYY-MM-DD" (optional, defaults to the first stored date)
+        end_date: Last date, inclusive (optional, defaults to the last stored date)
     
     Returns:
         Dictionary mapping date to comparison data
     """
-    comparison_files = glob.glob("./comparison/comparison_begin_*.json")
+    return load_comparison_range(start_date, end_date)
+
+def as_pivot(history, section):
+    """Use a SnapshotPivot as it is, or pivot a date -> records dictionary (e.g., from load_all_profit_files)"""
+    return history if isinstance(history, SnapshotPivot) else pivot_records(history, section)
+
+def chart_filename(prefix, coin=None, page=1):
+    """Path of a chart file, e.g., ./charts/vs_btc_BTC_USDC.png or ./charts/vs_btc_all_coins_p2.png"""
+    suffix = coin.replace('-', '_') if coin else "all_coins"
+    if page > 1:
+        suffix += f"_p{page}"
+    return f"{CHARTS_DIR}/{prefix}_{suffix}.{CHART_FORMAT}"
+
+def paginate_coins(coins, dpi=None):
+    """Split coins into pages of at most MAX_CHART_PIXELS per rendered figure
     
-    comparison_data = {}
-    for file_path in comparison_files:
-        # Extract date from filename
-        filename = os.path.basename(file_path)
-        date_str = filename.replace("comparison_begin_", "").replace(".json", "")
-        
-        # Convert YYYYMMDD to datetime
-        date = datetime.strptime(date_str, "%Y%m%d")
-        
-        with open(file_path, "r") as f:
-            data = json.load(f)
-        
-        comparison_data[date] = data
+    Args:
+        coins: Tickers to plot, one panel each
+        dpi: Resolution the figure is rendered at (defaults to CHART_DPI)
+    
+    Returns:
+        List of lists of tickers
+    """
+    dpi = dpi or CHART_DPI
+    panel_pixels = PANEL_WIDTH_INCHES * dpi * PANEL_HEIGHT_INCHES * dpi
+    coins_per_page = max(1, MAX_CHART_PIXELS // panel_pixels)
+    return [coins[idx:idx + coins_per_page] for idx in range(0, len(coins), coins_per_page)]
+
+def page_label(page_number, page_count):
+    """Title suffix for paged charts, e.g., " (2/3)" (empty for single-page charts)"""
+    return f" ({page_number}/{page_count})" if page_count > 1 else ""
+
+def save_chart(fig, filename):
+    """Save a figure in CHART_FORMAT at CHART_DPI and free it"""
+    os.makedirs(CHARTS_DIR, exist_ok=True)
+    fig.savefig(filename, dpi=CHART_DPI, bbox_inches='tight')
+    print(f"✅ Chart saved to {filename}")
     
-    return comparison_data
+    plt.close(fig)
+
+def remove_stale_pages(prefix, coin, page_count):
+    """Delete pages left over from a run that needed more pages than this one"""
+    page = page_count + 1
+    while os.path.exists(chart_filename(prefix, coin, page)):
+        os.remove(chart_filename(prefix, coin, page))
+        page += 1
 
-def plot_daily_profit_by_coin(profit_data, coin=None):
+def plot_daily_profit_by_coin(profit_data, coin=None, page=None, page_count=None):
     """Plot cumulative daily profit (realized + unrealized) for each coin or a specific coin
     
     Args:
-        profit_data: Dictionary mapping date to profit data
+        profit_data: SnapshotPivot of the profit section, or dictionary mapping date to profit data
         coin: Optional specific coin ticker (e.g., "BTC-USDC"). If None, plot all coins
+        page: Page number of the all-coins chart the data holds the coins of (optional,
+            renders only that page; see main)
+        page_count: Number of pages of the all-coins chart, for the page titles
     """
     if not profit_data:
         print("No profit data found")
         return
     
-    # Organize data by coin
-    coin_profits = defaultdict(lambda: {"dates": [], "realized": [], "unrealized": [], "total": []})
-    
-    sorted_dates = sorted(profit_data.keys())
-    
-    for date in sorted_dates:
-        data = profit_data[date]
-        for item in data:
-            ticker = item["ticker"]
-            
-            # Filter by coin if specified
-            if coin and ticker != coin:
-                continue
-            
-            coin_profits[ticker]["dates"].append(date)
-            coin_profits[ticker]["realized"].append(item["realized_profit"])
-            coin_profits[ticker]["unrealized"].append(item["unrealized_profit"])
-            coin_profits[ticker]["total"].append(item["total_profit"])
+    # Dates x tickers matrices of every field
+    pivot = as_pivot(profit_data, "profit")
     
     # If specific coin requested and not found
-    if coin and coin not in coin_profits:
+    if coin and coin not in pivot:
         print(f"Coin {coin} not found in profit data")
         return
     
     # Determine number of subplots needed
-    coins_to_plot = [coin] if coin else sorted(coin_profits.keys())
+    coins_to_plot = [coin] if coin else pivot.tickers
     num_coins = len(coins_to_plot)
     
     if num_coins == 0:
         print("No coins to plot")
         return
     
-    # Create figure with subplots
-    fig, axes = plt.subplots(num_coins, 1, figsize=(12, 4 * num_coins))
-    if num_coins == 1:
-        axes = [axes]
-    
-    fig.suptitle("Cumulative Daily Profit by Coin" if not coin else f"Cumulative Profit for {coin}", fontsize=16, y=0.995)
-    
-    for idx, ticker in enumerate(coins_to_plot):
-        ax = axes[idx]
-        data = coin_profits[ticker]
-        
-        dates = data["dates"]
-        realized = data["realized"]
-        unrealized = data["unrealized"]
-        total = data["total"]
-        
-        # Note: The data from profit_begin_YYYYMMDD.json is already cumulative
-        # because it includes all trades up to that date
-        # So we can use the values directly
-        
-        # Convert dates to numeric for bar positioning
-        x = np.arange(len(dates))
-        width = 0.8
-        
-        # Plot stacked bars: realized (dark) + unrealized (light) on top
-        realized_colors = ['darkgreen' if r >= 0 else 'darkred' for r in realized]
-        unrealized_colors = ['lightgreen' if u >= 0 else 'lightcoral' for u in unrealized]
+    # Split coins into pages so no single figure exceeds MAX_CHART_PIXELS
+    pages = paginate_coins(coins_to_plot)
+    for page_number, page_coins in enumerate(pages, page or 1):
+        # Create figure with subplots
+        fig, axes = plt.subplots(len(page_coins), 1, figsize=(PANEL_WIDTH_INCHES, PANEL_HEIGHT_INCHES * len(page_coins)))
+        if len(page_coins) == 1:
+            axes = [axes]
         
-        ax.bar(x, realized, width, label='Realized', color=realized_colors, alpha=0.7)
-        ax.bar(x, unrealized, width, bottom=realized, label='Unrealized', color=unrealized_colors, alpha=0.6)
+        fig.suptitle(("Cumulative Daily Profit by Coin" if not coin else f"Cumulative Profit for {coin}") + page_label(page_number, page_count or len(pages)), fontsize=16, y=0.995)
         
-        # Overlay line chart for total profit
-        ax2 = ax.twinx()  # Create a second y-axis
-        line_color = 'blue'
-        line = ax2.plot(x, total, marker='o', linewidth=2.5, markersize=5, color=line_color, 
-                       label='Total Profit', linestyle='-', zorder=10)
-        
-        # Add value labels on line data points
-        for i, value in enumerate(total):
-            if len(dates) <= 15 or i % max(1, len(dates)//8) == 0 or i == len(dates)-1:
-                ax2.annotate(f'${value:.0f}', 
-                           xy=(i, value), 
-                           xytext=(0, 10 if value >= 0 else -15),
-                           textcoords='offset points',
-                           ha='center',
-                           fontsize=7,
-                           bbox=dict(boxstyle='round,pad=0.3', facecolor='yellow', alpha=0.5))
-        
-        # Synchronize y-axes
-        ax2.set_ylim(ax.get_ylim())
-        ax2.set_ylabel('')
-        ax2.set_yticks([])
-        
-        # Add horizontal line at y=0
-        ax.axhline(y=0, color='black', linestyle='-', alpha=0.3, linewidth=1)
-        
-        # Formatting
-        ax.set_title(f"{ticker}", fontsize=12, fontweight='bold')
-        ax.set_xlabel("Date")
-        ax.set_ylabel("Cumulative Profit ($)")
-        
-        # Combine legends from both axes
-        bars_legend = ax.get_legend_handles_labels()
-        line_legend = ax2.get_legend_handles_labels()
-        ax.legend(bars_legend[0] + line_legend[0], bars_legend[1] + line_legend[1], 
-                 loc='best', fontsize=8)
+        for idx, ticker in enumerate(page_coins):
+            ax = axes[idx]
+            dates, realized, unrealized, total = pivot.series(ticker, "realized_profit", "unrealized_profit", "total_profit")
+            
+            # Note: Each daily profit snapshot is already cumulative
+            # because it includes all trades up to that date
+            # So we can use the values directly
+            
+            # Convert dates to numeric for bar positioning
+            x = np.arange(len(dates))
+            width = 0.8
+            
+            # Plot stacked bars: realized (dark) + unrealized (light) on top
+            realized_colors = ['darkgreen' if r >= 0 else 'darkred' for r in realized]
+            unrealized_colors = ['lightgreen' if u >= 0 else 'lightcoral' for u in unrealized]
+            
+            ax.bar(x, realized, width, label='Realized', color=realized_colors, alpha=0.7)
+            ax.bar(x, unrealized, width, bottom=realized, label='Unrealized', color=unrealized_colors, alpha=0.6)
+            
+            # Overlay line chart for total profit
+            ax2 = ax.twinx()  # Create a second y-axis
+            line_color = 'blue'
+            line = ax2.plot(x, total, marker='o', linewidth=2.5, markersize=5, color=line_color, 
+                           label='Total Profit', linestyle='-', zorder=10)
+            
+            # Add value labels on line data points
+            for i, value in enumerate(total):
+                if len(dates) <= 15 or i % max(1, len(dates)//8) == 0 or i == len(dates)-1:
+                    ax2.annotate(f'${value:.0f}', 
+                               xy=(i, value), 
+                               xytext=(0, 10 if value >= 0 else -15),
+                               textcoords='offset points',
+                               ha='center',
+                               fontsize=7,
+                               bbox=dict(boxstyle='round,pad=0.3', facecolor='yellow', alpha=0.5))
+            
+            # Synchronize y-axes
+            ax2.set_ylim(ax.get_ylim())
+            ax2.set_ylabel('')
+            ax2.set_yticks([])
+            
+            # Add horizontal line at y=0
+            ax.axhline(y=0, color='black', linestyle='-', alpha=0.3, linewidth=1)
+            
+            # Formatting
+            ax.set_title(f"{ticker}", fontsize=12, fontweight='bold')
+            ax.set_xlabel("Date")
+            ax.set_ylabel("Cumulative Profit ($)")
+            
+            # Combine legends from both axes
+            bars_legend = ax.get_legend_handles_labels()
+            line_legend = ax2.get_legend_handles_labels()
+            ax.legend(bars_legend[0] + line_legend[0], bars_legend[1] + line_legend[1], 
+                     loc='best', fontsize=8)
+            
+            ax.grid(True, alpha=0.3, axis='y')
+            
+            # Format x-axis dates
+            ax.set_xticks(x[::max(1, len(x)//10)])
+            ax.set_xticklabels([dates[i].strftime('%Y-%m-%d') for i in range(0, len(dates), max(1, len(dates)//10))],
+                              rotation=45, ha='right')
         
-        ax.grid(True, alpha=0.3, axis='y')
+        plt.tight_layout()
         
-        # Format x-axis dates
-        ax.set_xticks(x[::max(1, len(x)//10)])
-        ax.set_xticklabels([dates[i].strftime('%Y-%m-%d') for i in range(0, len(dates), max(1, len(dates)//10))],
-                          rotation=45, ha='right')
+        # Save combined chart
+        save_chart(fig, chart_filename("daily_profit", coin, page_number))
     
-    plt.tight_layout()
-    
-    # Save combined chart
-    os.makedirs("./charts", exist_ok=True)
-    filename = f"./charts/daily_profit_{coin.replace('-', '_')}.png" if coin else "./charts/daily_profit_all_coins.png"
-    plt.savefig(filename, dpi=300, bbox_inches='tight')
-    print(f"✅ Chart saved to {filename}")
-    
-    plt.close()
+    if page is None:
+        remove_stale_pages("daily_profit", coin, len(pages))
 
 def plot_total_daily_profit(profit_data):
     """Plot total cumulative daily profit across all coins
     
     Args:
-        profit_data: Dictionary mapping date to profit data
+        profit_data: SnapshotPivot of the profit section, or dictionary mapping date to profit data
     """
     if not profit_data:
         print("No profit data found")
         return
     
-    sorted_dates = sorted(profit_data.keys())
-    
-    total_realized = []
-    total_unrealized = []
-    total_profit = []
-    
-    for date in sorted_dates:
-        data = profit_data[date]
-        realized = sum(item["realized_profit"] for item in data)
-        unrealized = sum(item["unrealized_profit"] for item in data)
-        total = sum(item["total_profit"] for item in data)
-        
-        total_realized.append(realized)
-        total_unrealized.append(unrealized)
-        total_profit.append(total)
+    # Sum every field over all coins, one column sum per date
+    pivot = as_pivot(profit_data, "profit")
+    sorted_dates = pivot.dates
+    total_realized = pivot.totals("realized_profit")
+    total_unrealized = pivot.totals("unrealized_profit")
+    total_profit = pivot.totals("total_profit")
     
-    # Note: The data is already cumulative because profit_begin_YYYYMMDD.json
+    # Note: The data is already cumulative because each daily snapshot
     # includes all trades from the beginning up to that date
     
     # Create figure
@@ -273,233 +297,316 @@ def plot_total_daily_profit(profit_data):
     plt.tight_layout()
     
     # Save combined chart
-    os.makedirs("./charts", exist_ok=True)
-    filename = "./charts/total_daily_profit.png"
-    plt.savefig(filename, dpi=300, bbox_inches='tight')
-    print(f"✅ Chart saved to {filename}")
-    
-    plt.close()
+    save_chart(fig, f"{CHARTS_DIR}/total_daily_profit.{CHART_FORMAT}")
 
-def plot_vs_btc_comparison(comparison_data, coin=None):
+def plot_vs_btc_comparison(comparison_data, coin=None, page=None, page_count=None):
     """Plot profit comparison vs BTC for each coin
     
     Args:
-        comparison_data: Dictionary mapping date to comparison data
+        comparison_data: SnapshotPivot of the vs_btc_comparison section, or dictionary mapping date to comparison data
         coin: Optional specific coin ticker (e.g., "BTC-USDC"). If None, plot all coins
+        page: Page number of the all-coins chart the data holds the coins of (optional,
+            renders only that page; see main)
+        page_count: Number of pages of the all-coins chart, for the page titles
     """
     if not comparison_data:
         print("No comparison data found")
         return
     
-    # Organize data by coin
-    coin_comparisons = defaultdict(lambda: {"dates": [], "actual": [], "btc_alternative": [], "difference": []})
-    
-    sorted_dates = sorted(comparison_data.keys())
-    
-    for date in sorted_dates:
-        data = comparison_data[date]
-        vs_btc = data.get("vs_btc_comparison", [])
-        
-        for item in vs_btc:
-            ticker = item["ticker"]
-            
-            # Filter by coin if specified
-            if coin and ticker != coin:
-                continue
-            
-            coin_comparisons[ticker]["dates"].append(date)
-            coin_comparisons[ticker]["actual"].append(item["actual_profit"])
-            coin_comparisons[ticker]["btc_alternative"].append(item["btc_alternative_profit"])
-            coin_comparisons[ticker]["difference"].append(item["difference"])
+    # Dates x tickers matrices of every field
+    pivot = as_pivot(comparison_data, "vs_btc_comparison")
     
     # If specific coin requested and not found
-    if coin and coin not in coin_comparisons:
+    if coin and coin not in pivot:
         print(f"Coin {coin} not found in comparison data")
         return
     
     # Determine coins to plot
-    coins_to_plot = [coin] if coin else sorted(coin_comparisons.keys())
+    coins_to_plot = [coin] if coin else pivot.tickers
     num_coins = len(coins_to_plot)
     
     if num_coins == 0:
         print("No coins to plot")
         return
     
-    # Create figure with subplots
-    fig, axes = plt.subplots(num_coins, 1, figsize=(12, 4 * num_coins))
-    if num_coins == 1:
-        axes = [axes]
-    
-    fig.suptitle("Actual Profit vs BTC Alternative" if not coin else f"Profit vs BTC for {coin}", fontsize=16, y=0.995)
-    
-    for idx, ticker in enumerate(coins_to_plot):
-        ax = axes[idx]
-        data = coin_comparisons[ticker]
-        
-        dates = data["dates"]
-        actual = data["actual"]
-        btc_alt = data["btc_alternative"]
-        difference = data["difference"]
+    # Split coins into pages so no single figure exceeds MAX_CHART_PIXELS
+    pages = paginate_coins(coins_to_plot)
+    for page_number, page_coins in enumerate(pages, page or 1):
+        # Create figure with subplots
+        fig, axes = plt.subplots(len(page_coins), 1, figsize=(PANEL_WIDTH_INCHES, PANEL_HEIGHT_INCHES * len(page_coins)))
+        if len(page_coins) == 1:
+            axes = [axes]
         
-        # Plot lines
-        ax.plot(dates, actual, marker='o', label='Actual Profit', linewidth=2, color='blue')
-        ax.plot(dates, btc_alt, marker='s', label='BTC Alternative', linewidth=2, color='orange')
-        ax.plot(dates, difference, marker='^', label='Difference (Beat BTC)', linewidth=2, color='green', linestyle='--')
+        fig.suptitle(("Actual Profit vs BTC Alternative" if not coin else f"Profit vs BTC for {coin}") + page_label(page_number, page_count or len(pages)), fontsize=16, y=0.995)
         
-        # Add horizontal line at y=0
-        ax.axhline(y=0, color='gray', linestyle=':', alpha=0.5)
+        for idx, ticker in enumerate(page_coins):
+            ax = axes[idx]
+            dates, actual, btc_alt, difference = pivot.series(ticker, "actual_profit", "btc_alternative_profit", "difference")
+            
+            # Plot lines
+            ax.plot(dates, actual, marker='o', label='Actual Profit', linewidth=2, color='blue')
+            ax.plot(dates, btc_alt, marker='s', label='BTC Alternative', linewidth=2, color='orange')
+            ax.plot(dates, difference, marker='^', label='Difference (Beat BTC)', linewidth=2, color='green', linestyle='--')
+            
+            # Add horizontal line at y=0
+            ax.axhline(y=0, color='gray', linestyle=':', alpha=0.5)
+            
+            # Formatting
+            ax.set_title(f"{ticker}", fontsize=12, fontweight='bold')
+            ax.set_xlabel("Date")
+            ax.set_ylabel("Profit ($)")
+            ax.legend(loc='best')
+            ax.grid(True, alpha=0.3)
+            
+            # Format x-axis dates
+            ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
+            ax.xaxis.set_major_locator(mdates.DayLocator(interval=max(1, len(dates)//10)))
+            plt.setp(ax.xaxis.get_majorticklabels(), rotation=45, ha='right')
         
-        # Formatting
-        ax.set_title(f"{ticker}", fontsize=12, fontweight='bold')
-        ax.set_xlabel("Date")
-        ax.set_ylabel("Profit ($)")
-        ax.legend(loc='best')
-        ax.grid(True, alpha=0.3)
+        plt.tight_layout()
         
-        # Format x-axis dates
-        ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
-        ax.xaxis.set_major_locator(mdates.DayLocator(interval=max(1, len(dates)//10)))
-        plt.setp(ax.xaxis.get_majorticklabels(), rotation=45, ha='right')
-    
-    plt.tight_layout()
-    
-    # Save figure
-    os.makedirs("./charts", exist_ok=True)
-    filename = f"./charts/vs_btc_{coin.replace('-', '_')}.png" if coin else "./charts/vs_btc_all_coins.png"
-    plt.savefig(filename, dpi=300, bbox_inches='tight')
-    print(f"✅ Chart saved to {filename}")
+        # Save figure
+        save_chart(fig, chart_filename("vs_btc", coin, page_number))
     
-    plt.close()
+    if page is None:
+        remove_stale_pages("vs_btc", coin, len(pages))
 
-def plot_roi_comparison(comparison_data, coin=None):
+def plot_roi_comparison(comparison_data, coin=None, page=None, page_count=None):
     """Plot ROI comparison: price change vs trading ROI
     
     Args:
-        comparison_data: Dictionary mapping date to comparison data
+        comparison_data: SnapshotPivot of the roi_comparison section, or dictionary mapping date to comparison data
         coin: Optional specific coin ticker (e.g., "BTC-USDC"). If None, plot all coins
+        page: Page number of the all-coins chart the data holds the coins of (optional,
+            renders only that page; see main)
+        page_count: Number of pages of the all-coins chart, for the page titles
     """
     if not comparison_data:
         print("No comparison data found")
         return
     
-    # Organize data by coin
-    coin_roi = defaultdict(lambda: {"dates": [], "price_change": [], "trading_roi": [], "difference": []})
-    
-    sorted_dates = sorted(comparison_data.keys())
-    
-    for date in sorted_dates:
-        data = comparison_data[date]
-        roi_comp = data.get("roi_comparison", [])
-        
-        for item in roi_comp:
-            ticker = item["ticker"]
-            
-            # Filter by coin if specified
-            if coin and ticker != coin:
-                continue
-            
-            coin_roi[ticker]["dates"].append(date)
-            coin_roi[ticker]["price_change"].append(item["price_change_percent"])
-            coin_roi[ticker]["trading_roi"].append(item["trading_roi_percent"])
-            coin_roi[ticker]["difference"].append(item["performance_diff"])
+    # Dates x tickers matrices of every field
+    pivot = as_pivot(comparison_data, "roi_comparison")
     
     # If specific coin requested and not found
-    if coin and coin not in coin_roi:
+    if coin and coin not in pivot:
         print(f"Coin {coin} not found in ROI comparison data")
         return
     
     # Determine coins to plot
-    coins_to_plot = [coin] if coin else sorted(coin_roi.keys())
+    coins_to_plot = [coin] if coin else pivot.tickers
     num_coins = len(coins_to_plot)
     
     if num_coins == 0:
         print("No coins to plot")
         return
     
-    # Create figure with subplots
-    fig, axes = plt.subplots(num_coins, 1, figsize=(12, 4 * num_coins))
-    if num_coins == 1:
-        axes = [axes]
-    
-    fig.suptitle("Price Change vs Trading ROI" if not coin else f"ROI Comparison for {coin}", fontsize=16, y=0.995)
-    
-    for idx, ticker in enumerate(coins_to_plot):
-        ax = axes[idx]
-        data = coin_roi[ticker]
-        
-        dates = data["dates"]
-        price_change = data["price_change"]
-        trading_roi = data["trading_roi"]
-        difference = data["difference"]
+    # Split coins into pages so no single figure exceeds MAX_CHART_PIXELS
+    pages = paginate_coins(coins_to_plot)
+    for page_number, page_coins in enumerate(pages, page or 1):
+        # Create figure with subplots
+        fig, axes = plt.subplots(len(page_coins), 1, figsize=(PANEL_WIDTH_INCHES, PANEL_HEIGHT_INCHES * len(page_coins)))
+        if len(page_coins) == 1:
+            axes = [axes]
         
-        # Plot lines
-        ax.plot(dates, price_change, marker='o', label='Price Change %', linewidth=2, color='purple')
-        ax.plot(dates, trading_roi, marker='s', label='Trading ROI %', linewidth=2, color='blue')
-        ax.plot(dates, difference, marker='^', label='Performance Diff %', linewidth=2, color='green', linestyle='--')
+        fig.suptitle(("Price Change vs Trading ROI" if not coin else f"ROI Comparison for {coin}") + page_label(page_number, page_count or len(pages)), fontsize=16, y=0.995)
         
-        # Add horizontal line at y=0
-        ax.axhline(y=0, color='gray', linestyle=':', alpha=0.5)
+        for idx, ticker in enumerate(page_coins):
+            ax = axes[idx]
+            dates, price_change, trading_roi, difference = pivot.series(ticker, "price_change_percent", "trading_roi_percent", "performance_diff")
+            
+            # Plot lines
+            ax.plot(dates, price_change, marker='o', label='Price Change %', linewidth=2, color='purple')
+            ax.plot(dates, trading_roi, marker='s', label='Trading ROI %', linewidth=2, color='blue')
+            ax.plot(dates, difference, marker='^', label='Performance Diff %', linewidth=2, color='green', linestyle='--')
+            
+            # Add horizontal line at y=0
+            ax.axhline(y=0, color='gray', linestyle=':', alpha=0.5)
+            
+            # Formatting
+            ax.set_title(f"{ticker}", fontsize=12, fontweight='bold')
+            ax.set_xlabel("Date")
+            ax.set_ylabel("Percentage (%)")
+            ax.legend(loc='best')
+            ax.grid(True, alpha=0.3)
+            
+            # Format x-axis dates
+            ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
+            ax.xaxis.set_major_locator(mdates.DayLocator(interval=max(1, len(dates)//10)))
+            plt.setp(ax.xaxis.get_majorticklabels(), rotation=45, ha='right')
         
-        # Formatting
-        ax.set_title(f"{ticker}", fontsize=12, fontweight='bold')
-        ax.set_xlabel("Date")
-        ax.set_ylabel("Percentage (%)")
-        ax.legend(loc='best')
-        ax.grid(True, alpha=0.3)
+        plt.tight_layout()
         
-        # Format x-axis dates
-        ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
-        ax.xaxis.set_major_locator(mdates.DayLocator(interval=max(1, len(dates)//10)))
-        plt.setp(ax.xaxis.get_majorticklabels(), rotation=45, ha='right')
+        # Save figure
+        save_chart(fig, chart_filename("roi_comparison", coin, page_number))
     
-    plt.tight_layout()
+    if page is None:
+        remove_stale_pages("roi_comparison", coin, len(pages))
+
+def _render_chart(plot, *args, **kwargs):
+    """Run one plot function (in a worker process), returning what it printed"""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        plot(*args, **kwargs)
+    return output.getvalue()
+
+def fingerprint_chart(plot, pivot, kwargs):
+    """Hash of everything a chart is drawn from: the plot function, its options and its input series"""
+    settings = [RENDER_VERSION, CHART_FORMAT, CHART_DPI, MAX_CHART_PIXELS]
+    payload = json.dumps([settings, plot.__name__, kwargs, pivot.fingerprint()], sort_keys=True, separators=COMPACT_SEPARATORS)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def load_render_manifest():
+    """Load the fingerprints of the charts rendered so far (empty if there are none)"""
+    if not os.path.exists(RENDER_MANIFEST_FILE):
+        return {}
+    try:
+        with open(RENDER_MANIFEST_FILE, "r") as f:
+            return json.load(f)
+    except ValueError:
+        return {}
+
+def render_charts(jobs, workers=CHART_WORKERS):
+    """Render charts, each in its own worker process
     
-    # Save figure
-    os.makedirs("./charts", exist_ok=True)
-    filename = f"./charts/roi_comparison_{coin.replace('-', '_')}.png" if coin else "./charts/roi_comparison_all_coins.png"
-    plt.savefig(filename, dpi=300, bbox_inches='tight')
-    print(f"✅ Chart saved to {filename}")
+    Every chart is an independent Matplotlib figure, so the figures are drawn
+    and rasterized in parallel with the Agg backend.
+    
+    Args:
+        jobs: List of (description, filename, plot function, SnapshotPivot, kwargs), one file per job
+        workers: Number of worker processes (0 = one per CPU core, 1 = render in this process)
     
-    plt.close()
+    Returns:
+        List of filenames of the charts that failed
+    """
+    workers = workers or os.cpu_count() or 1
+    failed = []
+    
+    if workers <= 1 or len(jobs) <= 1:
+        for description, filename, plot, data, kwargs in jobs:
+            print(f"\n{description}...")
+            try:
+                plot(data, **kwargs)
+            except Exception as e:
+                print(f"❌ Error generating {description}: {e}")
+                failed.append(filename)
+        return failed
+    
+    print(f"\nRendering {len(jobs)} charts with {min(workers, len(jobs))} processes...")
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+        futures = {
+            executor.submit(_render_chart, plot, data, **kwargs): (description, filename)
+            for description, filename, plot, data, kwargs in jobs
+        }
+        for future in as_completed(futures):
+            description, filename = futures[future]
+            print(f"\n{description}...")
+            try:
+                print(future.result(), end="")
+            except Exception as e:
+                print(f"❌ Error generating {description}: {e}")
+                failed.append(filename)
+    return failed
+
+def page_jobs(description, prefix, plot, pivot):
+    """Render jobs for an all-coins chart, one per page
+    
+    Each page is drawn from only its own coins' columns, so its fingerprint
+    (and file) only changes when one of those coins' series does.
+    
+    Returns:
+        List of (description, filename, plot function, SnapshotPivot, kwargs)
+    """
+    pages = paginate_coins(pivot.tickers)
+    remove_stale_pages(prefix, None, len(pages))
+    if len(pages) == 1:
+        return [(description, chart_filename(prefix), plot, pivot, {})]
+    return [
+        (f"{description} (page {page}/{len(pages)})", chart_filename(prefix, None, page),
+         plot, pivot.select(*page_coins), {"page": page, "page_count": len(pages)})
+        for page, page_coins in enumerate(pages, 1)
+    ]
 
-def main():
-    """Main function to generate all charts"""
+def main(workers=CHART_WORKERS, per_coin=CHART_PER_COIN, force=CHART_FORCE):
+    """Main function to generate all charts
+    
+    Only charts whose inputs changed since they were last rendered (see
+    RENDER_MANIFEST_FILE) are rendered again.
+    
+    Args:
+        workers: Number of chart rendering processes (0 = one per CPU core, 1 = no worker processes)
+        per_coin: If True, also render a separate chart file for every coin
+        force: If True, render every chart even if its inputs did not change
+    """
+    # Load each section once, straight into dates x tickers matrices shared by all charts
     print("Loading profit data...")
-    profit_data = load_all_profit_files()
-    print(f"Found {len(profit_data)} profit data files")
+    profit_data = load_pivot("profit")
+    print(f"Found profit data for {len(profit_data)} dates")
     
     print("\nLoading comparison data...")
-    comparison_data = load_all_comparison_files()
-    print(f"Found {len(comparison_data)} comparison data files")
+    vs_btc_data = load_pivot("vs_btc_comparison")
+    roi_data = load_pivot("roi_comparison")
+    print(f"Found comparison data for {max(len(vs_btc_data), len(roi_data))} dates")
     
-    if not profit_data and not comparison_data:
-        print("\n❌ No data files found. Please run calculate_profit_by_date.py first.")
+    if not profit_data and not vs_btc_data and not roi_data:
+        print("\n❌ No data found. Please run calculate_profit_by_date.py first.")
         return
     
     print("\n" + "="*70)
     print("Generating Charts")
     print("="*70)
     
+    jobs = []
+    
     # Generate total profit chart
     if profit_data:
-        print("\n1. Generating total daily profit chart...")
-        plot_total_daily_profit(profit_data)
+        jobs.append(("1. Generating total daily profit chart", f"{CHARTS_DIR}/total_daily_profit.{CHART_FORMAT}",
+                     plot_total_daily_profit, profit_data, {}))
         
         # Generate individual coin profit charts (optional - can be commented out if too many)
-        print("\n2. Generating profit charts for each coin...")
-        plot_daily_profit_by_coin(profit_data)
+        jobs += page_jobs("2. Generating profit charts for each coin", "daily_profit", plot_daily_profit_by_coin, profit_data)
     
     # Generate comparison charts
-    if comparison_data:
-        print("\n3. Generating vs BTC comparison charts...")
-        plot_vs_btc_comparison(comparison_data)
-        
-        print("\n4. Generating ROI comparison charts...")
-        plot_roi_comparison(comparison_data)
+    if vs_btc_data:
+        jobs += page_jobs("3. Generating vs BTC comparison charts", "vs_btc", plot_vs_btc_comparison, vs_btc_data)
+    if roi_data:
+        jobs += page_jobs("4. Generating ROI comparison charts", "roi_comparison", plot_roi_comparison, roi_data)
+    
+    # One chart file per coin, each rendered as its own job from that coin's column only,
+    # so a coin's chart (and fingerprint) only changes when that coin's series does
+    if per_coin:
+        for ticker in profit_data.tickers:
+            jobs.append((f"Generating profit chart for {ticker}", chart_filename("daily_profit", ticker),
+                         plot_daily_profit_by_coin, profit_data.select(ticker), {"coin": ticker}))
+        for ticker in vs_btc_data.tickers:
+            jobs.append((f"Generating vs BTC chart for {ticker}", chart_filename("vs_btc", ticker),
+                         plot_vs_btc_comparison, vs_btc_data.select(ticker), {"coin": ticker}))
+        for ticker in roi_data.tickers:
+            jobs.append((f"Generating ROI chart for {ticker}", chart_filename("roi_comparison", ticker),
+                         plot_roi_comparison, roi_data.select(ticker), {"coin": ticker}))
+    
+    # Skip charts whose file exists and whose inputs are unchanged since they were rendered
+    manifest = load_render_manifest()
+    fingerprints = {filename: fingerprint_chart(plot, data, kwargs) for _, filename, plot, data, kwargs in jobs}
+    pending = [
+        job for job in jobs
+        if force or manifest.get(job[1]) != fingerprints[job[1]] or not os.path.exists(job[1])
+    ]
+    
+    failed = render_charts(pending, workers=workers)
+    
+    # Failed charts get no fingerprint, so they are rendered again next time
+    write_json_atomic(RENDER_MANIFEST_FILE, {
+        filename: fingerprint for filename, fingerprint in sorted(fingerprints.items()) if filename not in failed
+    }, indent=4)
     
     print("\n" + "="*70)
-    print("All charts generated successfully!")
-    print("Charts are saved in ./charts/ directory")
+    if failed:
+        print(f"❌ {len(failed)} of {len(pending)} charts failed")
+    else:
+        print("All charts generated successfully!")
+    print(f"🖼️  Charts: {len(pending) - len(failed)} rendered, {len(jobs) - len(pending)} unchanged (skipped), {len(failed)} failed")
+    print(f"Charts are saved in {CHARTS_DIR}/ directory")
     print("="*70)
 
 if __name__ == "__main__":